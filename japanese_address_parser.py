@@ -2,6 +2,10 @@ import re
 from typing import List, Dict, Optional, Tuple
 from postal_code_service import PostalCodeService
 
+# 1文字単位の置換・除去は正規表現ではなく変換表で行う
+_HYPHEN_TABLE = str.maketrans({'−': '-', 'ー': '-'})
+_PUNCTUATION_TABLE = str.maketrans('', '', '。、！？!?')
+
 class JapaneseAddressParser:
     def __init__(self):
         """日本の住所解析パーサー"""
@@ -73,7 +77,7 @@ class JapaneseAddressParser:
             address_part = match.group(2).strip()
             
             # 郵便番号を正規化
-            clean_postal = re.sub(r'[-−ー]', '-', postal_code)
+            clean_postal = postal_code.translate(_HYPHEN_TABLE)
             if len(clean_postal.replace('-', '')) == 7:
                 addresses.append({
                     'type': 'postal_code_address',
@@ -238,7 +242,7 @@ class JapaneseAddressParser:
     def clean_text_for_parsing(self, text: str) -> str:
         """解析用にテキストをクリーニング"""
         # 不要な文字を除去
-        cleaned = re.sub(r'[。、！？!?]', '', text)
+        cleaned = text.translate(_PUNCTUATION_TABLE)
         
         # 「の」を適切に処理（住所の場合は残す）
         # 例：「東京都の渋谷区」は残す、「1の2の3」は別途処理
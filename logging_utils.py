@@ -0,0 +1,25 @@
+import logging
+import time
+
+
+class RateLimitingFilter(logging.Filter):
+    """同一内容のログを一定時間内で1回に抑制するフィルタ"""
+    
+    def __init__(self, interval: float = 1.0):
+        super().__init__()
+        self.interval = interval
+        self._last_log_time = {}
+        self.max_keys = 1024  # 内容の異なるWARNINGが続いても辞書が伸び続けないように
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        # DEBUG/INFOはメッセージテンプレート単位で抑制する（引数の整形もしない）
+        # WARNING以上は内容の異なるエラーを隠さないよう、整形後のメッセージが同じものだけを抑制する
+        key = record.msg if record.levelno < logging.WARNING else (record.msg, record.getMessage())
+        now = time.monotonic()
+        last = self._last_log_time.get(key)
+        if last is not None and now - last < self.interval:
+            return False
+        if len(self._last_log_time) >= self.max_keys:
+            self._last_log_time.clear()
+        self._last_log_time[key] = now
+        return True
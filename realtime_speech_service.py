@@ -1,20 +1,181 @@
 import os
 import asyncio
+import atexit
+import collections
+import logging
 import queue
 import threading
+import numpy as np
 import pyaudio
 import streamlit as st
 from typing import Optional, Callable
+from google.api_core import exceptions as api_exceptions
 from google.cloud import speech
+from google.cloud.speech_v1.services.speech.transports import SpeechGrpcTransport
+from google.oauth2 import service_account
 import io
 import time
 import json
-import tempfile
-import atexit
 from streamlit.runtime.scriptrunner import add_script_run_ctx
+from logging_utils import RateLimitingFilter
+try:
+    import webrtcvad
+except ImportError:
+    # VAD未導入時は無音も含めて全チャンクを送信
+    webrtcvad = None
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    # orjson未導入時は標準のjsonで代用
+    _json_loads = json.loads
+
+
+logger = logging.getLogger(__name__)
+logger.addFilter(RateLimitingFilter())
+
+
+class SpeechClientPool:
+    """プロセス全体で共有するSpeechClient群（どれを使うかは各サービスが自分で選ぶ）"""
+    
+    POOL_SIZE = 2
+    # 切断検知用のkeepalive設定
+    # ストリームは295秒で張り直すので、その間に数回pingが届くよう30秒間隔にする
+    # Googleのフロントエンドは RPC のない間の ping を許可しておらず、超過すると GOAWAY(too_many_pings) で
+    # 切断されて逆に再接続が増えるため、ping は RPC 実行中だけに限り、データのない間の回数も gRPC の既定値に任せる
+    CHANNEL_OPTIONS = [
+        ("grpc.keepalive_time_ms", 30000),
+        ("grpc.keepalive_timeout_ms", 10000),
+        ("grpc.keepalive_permit_without_calls", 0),
+    ]
+    _lock = threading.Lock()
+    # 認証情報ごとにクライアント群を分ける（別の認証情報の呼び出し元に他人のクライアントを渡さない）
+    _clients = {}
+    _warmup_config = None
+    
+    @classmethod
+    def _create_client(cls, credentials=None) -> speech.SpeechClient:
+        """keepalive付きチャネルでSpeechClientを生成"""
+        channel = SpeechGrpcTransport.create_channel(
+            "speech.googleapis.com:443",
+            credentials=credentials,
+            options=cls.CHANNEL_OPTIONS,
+        )
+        return speech.SpeechClient(transport=SpeechGrpcTransport(channel=channel))
+    
+    @staticmethod
+    def _credentials_key(credentials=None):
+        """プールのキー（サービスアカウントはそのアカウント、未指定はwebrtc側と同じく認証ファイルのパス）"""
+        if credentials is None:
+            return ("default", os.getenv("GOOGLE_APPLICATION_CREDENTIALS"))
+        account = getattr(credentials, "service_account_email", None)
+        if account:
+            return ("service_account", account, getattr(credentials, "project_id", None))
+        return ("object", id(credentials))
+    
+    @classmethod
+    def _ensure_clients(cls, credentials=None) -> list:
+        key = cls._credentials_key(credentials)
+        clients = cls._clients.get(key)
+        if clients is None:
+            clients = [cls._create_client(credentials) for _ in range(cls.POOL_SIZE)]
+            cls._clients[key] = clients
+        return clients
+    
+    @classmethod
+    def get_client(cls, index: int = 0, credentials=None) -> speech.SpeechClient:
+        """認証情報ごとのindex番目の共有クライアントを取得（初回のみ生成、プール側は状態を持たない）"""
+        with cls._lock:
+            return cls._ensure_clients(credentials)[index % cls.POOL_SIZE]
+    
+    @classmethod
+    def prewarm(cls, index: int, credentials=None):
+        """index番目のクライアントの接続をバックグラウンドで確立"""
+        client = cls.get_client(index, credentials)
+        threading.Thread(target=cls.warm_up_client, args=(client,), daemon=True).start()
+    
+    @classmethod
+    def _get_warmup_config(cls) -> speech.StreamingRecognitionConfig:
+        """暖気用の最小ストリーミング設定（一度だけ生成）"""
+        if cls._warmup_config is None:
+            cls._warmup_config = speech.StreamingRecognitionConfig(
+                config=speech.RecognitionConfig(
+                    encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                    sample_rate_hertz=16000,
+                    language_code="ja-JP"
+                ),
+                single_utterance=True
+            )
+        return cls._warmup_config
+    
+    @classmethod
+    def warm_up_client(cls, client: speech.SpeechClient):
+        """無音の短いストリームを送ってチャネルを確立"""
+        try:
+            requests = iter([speech.StreamingRecognizeRequest(audio_content=b'\x00' * 3200)])
+            for _ in client.streaming_recognize(cls._get_warmup_config(), requests, timeout=1.0):
+                pass
+        except Exception as e:
+            logger.debug("Speech client pre-warm failed (non-critical): %s", e)
+
+
+class AudioRingBuffer:
+    """固定長の音声チャンクバッファ（満杯時は最古のチャンクを破棄）"""
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._chunks = collections.deque(maxlen=capacity)
+        self._cv = threading.Condition()
+    
+    def __len__(self) -> int:
+        return len(self._chunks)
+    
+    def push(self, data: bytes):
+        """チャンクを追加してコンシューマを起こす"""
+        with self._cv:
+            self._chunks.append(data)
+            self._cv.notify()
+    
+    def pop(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """最古のチャンクを取り出す（timeout秒以内に無ければNone）"""
+        with self._cv:
+            if not self._chunks:
+                self._cv.wait(timeout=timeout)
+            return self._chunks.popleft() if self._chunks else None
+    
+    def wake(self):
+        """待機中のコンシューマを起こす（停止時用）"""
+        with self._cv:
+            self._cv.notify_all()
+    
+    def clear(self):
+        """未読のチャンクを破棄"""
+        with self._cv:
+            self._chunks.clear()
+
 
 class RealtimeSpeechService:
-    def __init__(self, auto_warm_up=True):
+    # セッション状態キー（接尾辞）→ 既定値ファクトリ
+    _SESSION_STATE_DEFAULTS = {
+        'interim_text': str,
+        'final_text': str,
+        'all_final_text': str,
+        'extracted_addresses': list,
+        'best_address': lambda: None,
+        'recognition_active': bool,
+        'last_update_time': time.time,
+        'error_message': str,
+        'performance_stats': lambda: {
+            'total_extractions': 0,
+            'total_time_ms': 0.0,  # 平均は読み出し時に total_time_ms / total_extractions で算出
+            'min_time_ms': float('inf'),
+            'max_time_ms': 0,
+            'fast_extractions': 0  # 500ms以下の回数
+        },
+        'reconnecting': bool,
+    }
+    
+    def __init__(self, auto_warm_up=True, interim_debounce_ms=100):
         """Google Cloud Speech-to-Text Streamingサービス"""
         self.project_id = os.getenv("GOOGLE_CLOUD_PROJECT_ID")
         
@@ -22,6 +183,7 @@ class RealtimeSpeechService:
             raise ValueError("GOOGLE_CLOUD_PROJECT_ID environment variable not found")
         
         # Google Cloud認証の設定
+        self._credentials = None
         self._setup_google_credentials()
         
         # 音声設定
@@ -29,71 +191,236 @@ class RealtimeSpeechService:
         self.chunk_size = 1024
         self.channels = 1
         
-        # Google Cloud Speech client
-        self.client = speech.SpeechClient()
+        # Google Cloud Speech client（全セッションで共有、使用中/予備の選択はこのサービスだけが持つ）
+        self._client_idx = 0
+        self.client = SpeechClientPool.get_client(self._client_idx, self._credentials)
+        
+        # 音声認識設定（再接続のたびに作り直さない）
+        self._streaming_config = speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=self.sample_rate,
+                language_code="ja-JP",
+                enable_automatic_punctuation=True,
+                model="latest_long",
+            ),
+            interim_results=True,
+            single_utterance=False,
+        )
         
         # 録音関連
-        self.audio_queue = queue.Queue()
+        self.audio_ring = AudioRingBuffer(capacity=64)
         self.recording = False
-        self.audio_thread = None
+        self._stop_event = threading.Event()  # 停止時に待機を即座に解除する
+        self._pa = None  # サービス存続中は1つのPyAudioを使い回す
+        self._pa_lock = threading.Lock()
+        self._device_cache = None
+        self._audio_stream = None
+        self._decimation_factor = 1
         self.recognition_thread = None
         
         # Streamlit統合用
         self.session_state_key_prefix = "realtime_"
         self.address_parser = None
+        self._session_initialized = False
+        
+        # セッション状態キーは毎回組み立てずに事前計算しておく
+        self._keys = {key: self.session_state_key_prefix + key for key in self._SESSION_STATE_DEFAULTS}
+        
+        # 仮の結果の書き込み間隔（最新のみ反映）
+        self.interim_debounce_sec = interim_debounce_ms / 1000
+        self._last_interim_ts = 0.0
+        self._pending_interim = None  # 間隔内に届いた最新の仮の結果（間隔明けにタイマーで反映）
+        self._interim_timer = None
+        self._interim_lock = threading.Lock()
+        
+        # 確定テキストは断片のリストで保持し（切り詰めない）、読み出し時にだけ連結する
+        # 連結結果は (断片数, 文字列) で保持し、断片が増えたときだけ作り直す
+        # 住所抽出側は新しい断片と直前の末尾（_parse_tail）だけを見るので、全文の長さに比例しない
+        self._final_segments = []
+        self._final_text_cache = (0, "")
+        self._last_final_hash = 0  # 直前の確定テキストの指紋（重複確定の検出用）
+        
+        # VAD（無音区間をgRPCに送らない）
+        self._vad = webrtcvad.Vad(2) if webrtcvad else None
+        self.vad_frame_samples = self.sample_rate // 50  # 20ms
+        self.vad_hangover_sec = 0.5
+        self._vad_preroll = collections.deque(maxlen=3)
+        self._last_speech_ts = None
+        # 無音が続いてもGoogle側の音声タイムアウト（約10秒）で切られないよう、間引き中も数秒おきに無音を送る
+        self.vad_keepalive_sec = 3.0
+        self._vad_keepalive_chunk = bytes(self.sample_rate // 10 * 2)  # 100msの無音（16bit）
+        self._last_sent_ts = None
+        
+        # 住所抽出ワーカー（溜まった発話は最大 parse_batch_size 件ずつまとめて解析、認識の開始・停止に合わせて起動・終了）
+        self._parse_queue = queue.Queue()
+        self.parse_batch_size = 8
+        self._parse_tail = ""  # 直前に解析したテキストの末尾（断片の境界をまたぐ住所用）
+        self.parse_tail_chars = 40
+        self._parse_worker = None
+        self._parse_stop = None
         
         # ストリーミング制限管理
         self.streaming_start_time = None
         self.max_streaming_duration = 295  # 295秒（Google Cloudの305秒制限より前に再接続）
+        self.min_prebuffer_duration = 0.2  # 認識開始前に溜める音声の長さ（秒）
+        self.prewarm_lead_time = 10  # 再接続の何秒前に予備クライアントを暖気するか
+        self._standby_prewarmed = False
         self.auto_reconnect_enabled = True
         
         # 暖気フラグ
         self.is_warmed_up = False
+        self._warm_thread = None
         
-        # 自動暖気実行（デフォルト有効）
+        # 自動暖気実行（デフォルト有効、バックグラウンドで実行して__init__をブロックしない）
         if auto_warm_up:
-            self.warm_up_services()
-            self.is_warmed_up = True
+            self._warm_thread = threading.Thread(target=self._warm_and_flag, daemon=True)
+            self._warm_thread.start()
+        
+    def _is_speech(self, chunk: bytes) -> bool:
+        """チャンク内の20msフレームのいずれかが発話ならTrue"""
+        frame_bytes = self.vad_frame_samples * 2
+        for offset in range(0, len(chunk) - frame_bytes + 1, frame_bytes):
+            if self._vad.is_speech(chunk[offset:offset + frame_bytes], self.sample_rate):
+                return True
+        return False
+    
+    def _gate_chunk(self, chunk: bytes) -> list:
+        """VADで無音チャンクを間引き、送信すべきチャンクのリストを返す"""
+        if self._vad is None:
+            return [chunk]
+        
+        now = time.monotonic()
+        if self._is_speech(chunk):
+            # 発話開始直前の音声（プリロール）も一緒に送る
+            self._last_speech_ts = self._last_sent_ts = now
+            chunks = list(self._vad_preroll)
+            self._vad_preroll.clear()
+            chunks.append(chunk)
+            return chunks
+        
+        if self._last_speech_ts is not None and now - self._last_speech_ts < self.vad_hangover_sec:
+            self._last_sent_ts = now
+            return [chunk]
         
+        self._vad_preroll.append(chunk)
+        if self._last_sent_ts is None or now - self._last_sent_ts >= self.vad_keepalive_sec:
+            # 低頻度の無音でストリームを生かしておく（切断→再接続のループを避ける）
+            self._last_sent_ts = now
+            return [self._vad_keepalive_chunk]
+        return []
+    
     def _audio_generator(self):
-        """音声データのジェネレータ"""
+        """音声データのジェネレータ（無音区間はスキップ）"""
         while self.recording:
-            try:
-                chunk = self.audio_queue.get(timeout=1)
+            chunk = self.audio_ring.pop(timeout=1)
+            if chunk is not None:
+                yield from self._gate_chunk(chunk)
+    
+    def _batched_requests(self):
+        """溜まっているチャンクをまとめて1つのリクエストにする（滞留量に応じてバッチ幅を調整）"""
+        for first in self._audio_generator():
+            pending = len(self.audio_ring)
+            if pending < 2:
+                batch_size = 1  # 遅延を抑えるため即送信
+            elif pending > 8:
+                batch_size = 8
+            else:
+                batch_size = 4
+            
+            buf = bytearray(first)
+            for _ in range(batch_size - 1):
+                chunk = self.audio_ring.pop(timeout=0)
                 if chunk is None:
                     break
-                yield chunk
-            except queue.Empty:
-                continue
+                for gated in self._gate_chunk(chunk):
+                    buf += gated
+            
+            yield speech.StreamingRecognizeRequest(audio_content=bytes(buf))
     
-    def _record_audio(self):
-        """音声録音のスレッド関数"""
-        audio = pyaudio.PyAudio()
+    def _get_decimation_factor(self, audio) -> int:
+        """デフォルト入力デバイスのネイティブレートから間引き率を求める（不要なら1）"""
+        try:
+            native_rate = int(audio.get_default_input_device_info().get('defaultSampleRate', self.sample_rate))
+        except Exception:
+            return 1
         
+        # 16kHzの整数倍（48kHz→3, 32kHz→2）の場合のみアプリ側で間引く
+        if native_rate > self.sample_rate and native_rate % self.sample_rate == 0:
+            return native_rate // self.sample_rate
+        return 1
+    
+    def _downsample(self, data: bytes, factor: int) -> bytes:
+        """int16 PCMを factor 分の1 に間引く（factorタップの移動平均でローパス）"""
+        samples = np.frombuffer(data, dtype=np.int16)
+        usable = len(samples) - len(samples) % factor
+        decimated = samples[:usable].reshape(-1, factor).mean(axis=1, dtype=np.float32)
+        return decimated.astype(np.int16).tobytes()
+    
+    def _pa_callback(self, in_data, frame_count, time_info, status):
+        """PortAudioのI/Oスレッドから呼ばれる録音コールバック"""
         try:
-            stream = audio.open(
+            data = in_data
+            if self._decimation_factor > 1:
+                data = self._downsample(data, self._decimation_factor)
+            self.audio_ring.push(data)
+        except Exception as e:
+            logger.warning("Audio recording error: %s", e)
+        return (None, pyaudio.paContinue if self.recording else pyaudio.paComplete)
+    
+    def _get_pa(self) -> pyaudio.PyAudio:
+        """共有PyAudioインスタンスを取得（初回のみ初期化）"""
+        with self._pa_lock:
+            if self._pa is None:
+                self._pa = pyaudio.PyAudio()
+                atexit.register(self._pa.terminate)
+            return self._pa
+    
+    def _start_audio_stream(self) -> bool:
+        """コールバックモードで録音ストリームを開始"""
+        try:
+            pa = self._get_pa()
+            
+            # ネイティブレートで開き、ドライバ側のリサンプラを回避する
+            self._decimation_factor = self._get_decimation_factor(pa)
+            
+            self._audio_stream = pa.open(
                 format=pyaudio.paInt16,
                 channels=self.channels,
-                rate=self.sample_rate,
+                rate=self.sample_rate * self._decimation_factor,
                 input=True,
-                frames_per_buffer=self.chunk_size
+                frames_per_buffer=self.chunk_size * self._decimation_factor,
+                stream_callback=self._pa_callback
             )
-            
-            while self.recording:
-                try:
-                    data = stream.read(self.chunk_size, exception_on_overflow=False)
-                    self.audio_queue.put(data)
-                except Exception as e:
-                    print(f"Audio recording error: {e}")
-                    break
-                    
+            return True
         except Exception as e:
-            print(f"Audio stream setup error: {e}")
+            logger.warning("Audio stream setup error: %s", e)
+            self._stop_audio_stream()
+            return False
+    
+    def _stop_audio_stream(self):
+        """録音ストリームを停止して解放"""
+        try:
+            if self._audio_stream is not None:
+                self._audio_stream.stop_stream()
+                self._audio_stream.close()
+        except Exception as e:
+            logger.warning("Audio stream close error: %s", e)
         finally:
-            if 'stream' in locals():
-                stream.stop_stream()
-                stream.close()
-            audio.terminate()
+            self._audio_stream = None
+    
+    def _buffered_duration(self) -> float:
+        """音声キューに溜まっている音声の長さ（秒）"""
+        return len(self.audio_ring) * self.chunk_size / self.sample_rate
+    
+    def _wait_for_prebuffer(self, timeout: float = 2.0):
+        """最初のgRPCフレームが安定した音声になるよう、一定量溜まるまで待機"""
+        deadline = time.monotonic() + timeout
+        while self.recording and time.monotonic() < deadline:
+            if self._buffered_duration() >= self.min_prebuffer_duration:
+                return
+            if self._stop_event.wait(0.01):
+                return
     
     def set_address_parser(self, address_parser):
         """住所パーサーを設定"""
@@ -110,64 +437,68 @@ class RealtimeSpeechService:
             if self.recording:
                 return False
             
-            # セッション状態を初期化（強制的に再初期化）
+            # セッション状態を初期化（初回のみ）
             self._initialize_session_state()
             
             # 重要なキーが存在することを再確認
             required_keys = ['all_final_text', 'final_text', 'interim_text']
             for key in required_keys:
-                full_key = f"{self.session_state_key_prefix}{key}"
+                full_key = self._keys[key]
                 if full_key not in st.session_state:
                     st.session_state[full_key] = ""
             
+            # 暖気が未完了なら少しだけ待つ
+            if not self.is_warmed_up and self._warm_thread and self._warm_thread.is_alive():
+                self._warm_thread.join(timeout=1.0)
+            
+            # 前回セッションの残り音声とVAD状態を破棄
+            self.audio_ring.clear()
+            self._vad_preroll.clear()
+            self._last_speech_ts = None
+            self._last_sent_ts = None
+            self._stop_event.clear()
             self.recording = True
             
             # ストリーミング開始時刻を記録
             self.streaming_start_time = time.time()
             
             # 音声録音スレッドを開始（Streamlitコンテキスト付与）
-            self.audio_thread = threading.Thread(target=self._record_audio)
-            add_script_run_ctx(self.audio_thread)
-            self.audio_thread.start()
-            
-            # 音声認識設定
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=self.sample_rate,
-                language_code="ja-JP",
-                enable_automatic_punctuation=True,
-                model="latest_long",
-            )
+            if not self._start_audio_stream():
+                self.recording = False
+                return False
             
-            streaming_config = speech.StreamingRecognitionConfig(
-                config=config,
-                interim_results=True,
-                single_utterance=False,
-            )
+            self._start_parse_worker()
             
             # ストリーミング認識の開始
             def run_recognition():
-                try:
-                    while self.recording:
+                # 約200msの音声が溜まってからストリーミングを開く
+                self._wait_for_prebuffer()
+                
+                # 再接続は再帰ではなくループで行う（スタックを積み上げない）
+                while self.recording:
+                    try:
                         # ストリーミング時間制限チェック
                         if self._should_restart_streaming():
-                            print("Restarting streaming due to time limit...")
+                            logger.info("Restarting streaming due to time limit...")
                             self._restart_streaming()
                             continue
                         
-                        audio_generator = self._audio_generator()
-                        requests = (speech.StreamingRecognizeRequest(audio_content=chunk)
-                                  for chunk in audio_generator)
-                        
-                        responses = self.client.streaming_recognize(streaming_config, requests)
+                        # ジェネレータとレスポンスはこの反復内だけで保持する
+                        responses = self.client.streaming_recognize(self._streaming_config, self._batched_requests())
                         
                         for response in responses:
                             if not self.recording:
                                 break
                                 
+                            # 再接続に備えて予備クライアントを先に暖気
+                            if self._should_prewarm_standby():
+                                SpeechClientPool.prewarm(self._client_idx + 1, self._credentials)
+                                self._standby_prewarmed = True
+                            
                             # 再度時間制限チェック
                             if self._should_restart_streaming():
-                                print("Breaking current streaming for restart...")
+                                logger.info("Breaking current streaming for restart...")
+                                self._swap_client()
                                 break
                                 
                             for result in response.results:
@@ -178,25 +509,42 @@ class RealtimeSpeechService:
                         
                         # ここで一度ストリーミングが終了した場合は再接続
                         if self.recording and self.auto_reconnect_enabled:
-                            print("Streaming ended, restarting...")
-                            time.sleep(0.1)  # 短いポーズ
+                            logger.info("Streaming ended, restarting...")
+                            if self._stop_event.wait(0.1):  # 短いポーズ（停止時は即終了）
+                                break
                             self.streaming_start_time = time.time()  # タイマーリセット
+                            self._standby_prewarmed = False
                                 
-                except Exception as e:
-                    error_msg = str(e)
-                    print(f"Speech recognition error: {error_msg}")
-                    
-                    # 305秒制限エラーの場合は自動再接続
-                    if "Exceeded maximum allowed stream duration" in error_msg or "400" in error_msg:
-                        if self.recording and self.auto_reconnect_enabled:
-                            print("Auto-restarting due to duration limit...")
+                    except Exception as e:
+                        error_msg = str(e)
+                        logger.warning("Speech recognition error: %s", error_msg)
+                        
+                        # keepaliveで検知した切断は予備クライアントへ切り替えて再接続
+                        if isinstance(e, api_exceptions.ServiceUnavailable) and self.recording and self.auto_reconnect_enabled:
+                            logger.info("Connection dropped, switching to standby client...")
                             self._restart_streaming()
-                            # 再帰的に再開
-                            run_recognition()
-                        else:
+                            continue
+                        
+                        # 無音が長すぎた場合の音声タイムアウトは、同じクライアントでストリームだけを開き直す
+                        # （プールの切り替えや時間制限扱いの再接続はしない）
+                        if "Audio Timeout" in error_msg and self.recording and self.auto_reconnect_enabled:
+                            logger.info("Audio timeout, reopening stream...")
+                            if self._stop_event.wait(0.1):
+                                break
+                            self.streaming_start_time = time.time()
+                            self._standby_prewarmed = False
+                            continue
+                        
+                        # 305秒制限エラーの場合は自動再接続
+                        if "Exceeded maximum allowed stream duration" in error_msg or "400" in error_msg:
+                            if self.recording and self.auto_reconnect_enabled:
+                                logger.info("Auto-restarting due to duration limit...")
+                                self._restart_streaming()
+                                continue
                             self._handle_recognition_error("ストリーミング時間制限に達しました。再接続中...")
-                    else:
-                        self._handle_recognition_error(error_msg)
+                        else:
+                            self._handle_recognition_error(error_msg)
+                        break
             
             # 認識スレッドを開始（Streamlitコンテキスト付与）
             self.recognition_thread = threading.Thread(target=run_recognition)
@@ -206,158 +554,235 @@ class RealtimeSpeechService:
             return True
             
         except Exception as e:
-            print(f"Failed to start streaming recognition: {e}")
+            logger.warning("Failed to start streaming recognition: %s", e)
             self.recording = False
+            self._stop_parse_worker(timeout=0)
             return False
     
     def _initialize_session_state(self):
-        """Streamlitセッション状態を初期化（堅牢性向上版）"""
+        """Streamlitセッション状態を初期化（初期化済みなら何もしない）"""
+        if self._session_initialized:
+            return
+        
         try:
-            keys_to_init = [
-                'interim_text',
-                'final_text', 
-                'all_final_text',
-                'extracted_addresses',
-                'best_address',
-                'recognition_active',
-                'last_update_time',
-                'error_message',
-                'performance_stats',
-                'reconnecting'
-            ]
-            
-            for key in keys_to_init:
-                full_key = f"{self.session_state_key_prefix}{key}"
+            for key, default_factory in self._SESSION_STATE_DEFAULTS.items():
+                full_key = self._keys[key]
                 try:
                     if full_key not in st.session_state:
-                        if key in ['interim_text', 'final_text', 'all_final_text', 'error_message']:
-                            st.session_state[full_key] = ""
-                        elif key in ['extracted_addresses']:
-                            st.session_state[full_key] = []
-                        elif key in ['best_address']:
-                            st.session_state[full_key] = None
-                        elif key in ['recognition_active']:
-                            st.session_state[full_key] = False
-                        elif key in ['last_update_time']:
-                            st.session_state[full_key] = time.time()
-                        elif key in ['performance_stats']:
-                            st.session_state[full_key] = {
-                                'total_extractions': 0,
-                                'avg_time_ms': 0,
-                                'min_time_ms': float('inf'),
-                                'max_time_ms': 0,
-                                'fast_extractions': 0  # 500ms以下の回数
-                            }
-                        elif key in ['reconnecting']:
-                            st.session_state[full_key] = False
+                        st.session_state[full_key] = default_factory()
                 except Exception as e:
-                    print(f"Warning: Failed to initialize session state key '{full_key}': {e}")
-                    # 基本的なフォールバック値を設定
-                    try:
-                        st.session_state[full_key] = "" if "text" in key else ([] if "addresses" in key else (False if "active" in key else None))
-                    except:
-                        pass  # 最終的な初期化も失敗した場合は無視
+                    logger.warning("Failed to initialize session state key '%s': %s", full_key, e)
+            
+            self._session_initialized = True
         except Exception as e:
-            print(f"Critical error in session state initialization: {e}")
+            logger.error("Critical error in session state initialization: %s", e)
     
     def _handle_recognition_result(self, transcript: str, is_final: bool):
         """音声認識結果を処理してセッション状態を更新（スレッドセーフ実装）"""
         try:
+            # キーの存在は_initialize_session_stateで保証済み（欠けていればKeyErrorで検知）
+            if not self._session_initialized:
+                logger.warning("Session state is not initialized; dropping recognition result")
+                return
             # セッション状態のキーを事前に定義
-            final_key = f"{self.session_state_key_prefix}final_text"
-            all_final_key = f"{self.session_state_key_prefix}all_final_text"
-            interim_key = f"{self.session_state_key_prefix}interim_text"
-            update_time_key = f"{self.session_state_key_prefix}last_update_time"
-            active_key = f"{self.session_state_key_prefix}recognition_active"
+            final_key = self._keys['final_text']
+            interim_key = self._keys['interim_text']
+            update_time_key = self._keys['last_update_time']
+            active_key = self._keys['recognition_active']
             
-            # セッション状態の存在チェックと安全な更新
             if is_final:
+                # 空白のみ・直前と同一の確定結果は無視（住所抽出の再実行を避ける）
+                stripped = transcript.strip()
+                if not stripped:
+                    return
+                h = hash(stripped)
+                if h == self._last_final_hash:
+                    return
+                self._last_final_hash = h
+                
                 # 確定した結果
-                if final_key in st.session_state:
-                    st.session_state[final_key] = transcript
+                st.session_state[final_key] = transcript
                 
-                if all_final_key in st.session_state:
-                    st.session_state[all_final_key] += transcript + " "
-                    current_text = st.session_state[all_final_key]
-                else:
-                    current_text = transcript + " "
-                    st.session_state[all_final_key] = current_text
+                # 全文は確定のたびに連結し直さず、get_session_state_data での読み出し時に作る
+                self._final_segments.append(transcript)
                 
-                if interim_key in st.session_state:
-                    st.session_state[interim_key] = ""  # 仮の結果をクリア
+                self._cancel_pending_interim()  # 確定後に古い仮の結果が書き戻されないように
+                st.session_state[interim_key] = ""  # 仮の結果をクリア
                 
-                # 住所抽出を実行
+                # 住所抽出はワーカーに任せる（新しく確定した断片のみ）
                 if self.address_parser:
-                    self._extract_addresses_from_text(current_text)
+                    self._submit_address_extraction(transcript)
                 
             else:
-                # 仮の結果
-                if interim_key in st.session_state:
-                    st.session_state[interim_key] = transcript
+                # 仮の結果は常に最新を保持し、書き込みだけを一定間隔に間引く
+                self._schedule_interim(transcript)
+                return
             
             # 更新時刻を記録
-            if update_time_key in st.session_state:
-                st.session_state[update_time_key] = time.time()
-            if active_key in st.session_state:
-                st.session_state[active_key] = True
+            st.session_state[update_time_key] = time.time()
+            st.session_state[active_key] = True
             
+        except KeyError as e:
+            logger.warning("Session state key missing: %s", e)
         except Exception as e:
-            print(f"Error handling recognition result: {e}")
+            logger.warning("Error handling recognition result: %s", e)
             # セッション状態にエラーメッセージを安全に記録
-            error_key = f"{self.session_state_key_prefix}error_message"
-            if error_key in st.session_state:
-                st.session_state[error_key] = f"Recognition error: {str(e)}"
+            st.session_state[self._keys['error_message']] = f"Recognition error: {str(e)}"
     
-    def _extract_addresses_from_text(self, text: str):
-        """テキストから住所を抽出してセッション状態に保存（スレッドセーフ実装・パフォーマンス統計付き）"""
-        try:
-            if not self.address_parser or not text.strip():
+    def _schedule_interim(self, transcript: str):
+        """最新の仮の結果を保持し、間隔が空いていれば即時、そうでなければ間隔明けに書き込む"""
+        with self._interim_lock:
+            self._pending_interim = transcript
+            wait = self.interim_debounce_sec - (time.monotonic() - self._last_interim_ts)
+            if wait > 0:
+                # 発話が途切れても最後の仮の結果が表示に残るよう、間隔明けに必ず反映する
+                if self._interim_timer is None:
+                    self._interim_timer = threading.Timer(wait, self._flush_pending_interim)
+                    self._interim_timer.daemon = True
+                    add_script_run_ctx(self._interim_timer)
+                    self._interim_timer.start()
                 return
+        self._flush_pending_interim()
+    
+    def _flush_pending_interim(self):
+        """保持している仮の結果をセッション状態に書き込む"""
+        # 確定時のクリアより後に古い仮の結果を書かないよう、書き込みまでロック内で行う
+        with self._interim_lock:
+            self._interim_timer = None
+            transcript = self._pending_interim
+            self._pending_interim = None
+            if transcript is None:
+                return
+            self._last_interim_ts = time.monotonic()
+            try:
+                st.session_state[self._keys['interim_text']] = transcript
+                st.session_state[self._keys['last_update_time']] = time.time()
+                st.session_state[self._keys['recognition_active']] = True
+            except Exception as e:
+                logger.warning("Error writing interim result: %s", e)
+    
+    def _cancel_pending_interim(self):
+        """未反映の仮の結果と書き込みタイマーを破棄"""
+        with self._interim_lock:
+            self._pending_interim = None
+            if self._interim_timer is not None:
+                self._interim_timer.cancel()
+                self._interim_timer = None
+    
+    def get_all_final_text(self) -> str:
+        """確定済みテキスト全体を連結して取得（前回から断片が増えていなければ連結済みの文字列を返す）"""
+        segments = self._final_segments
+        count = len(segments)
+        cached_count, cached_text = self._final_text_cache
+        if cached_count == count:
+            return cached_text
+        # 認識スレッドが追記中でも、数えた分だけを連結する
+        text = " ".join(segments[:count]) + " "
+        self._final_text_cache = (count, text)
+        return text
+    
+    def _submit_address_extraction(self, text: str):
+        """住所抽出を依頼（ワーカーが処理待ちの発話をまとめて解析する）"""
+        self._parse_queue.put_nowait(text)
+    
+    def _start_parse_worker(self):
+        """住所抽出ワーカーを起動（ワーカーごとに停止イベントを持たせる）"""
+        self._parse_stop = threading.Event()
+        self._parse_worker = threading.Thread(target=self._parse_loop, args=(self._parse_stop,), daemon=True)
+        add_script_run_ctx(self._parse_worker)
+        self._parse_worker.start()
+    
+    def _stop_parse_worker(self, timeout: float = 2.0):
+        """住所抽出ワーカーに停止を指示し、残りの依頼を処理し終えるのを待つ"""
+        if self._parse_stop is not None:
+            self._parse_stop.set()
+        if self._parse_worker and self._parse_worker.is_alive():
+            self._parse_worker.join(timeout=timeout)
+        self._parse_worker = None
+    
+    def _parse_loop(self, stop_event: threading.Event):
+        """住所抽出ワーカーのメインループ（停止指示後はキューが空になった時点で終了）"""
+        while True:
+            try:
+                texts = [self._parse_queue.get(timeout=0.5)]
+            except queue.Empty:
+                if stop_event.is_set():
+                    return
+                continue
+            # 解析中に溜まった発話もまとめて1回のバッチで解析する
+            while len(texts) < self.parse_batch_size:
+                try:
+                    texts.append(self._parse_queue.get_nowait())
+                except queue.Empty:
+                    break
             
-            addresses = self.address_parser.extract_addresses_from_realtime_text(text)
-            
-            addresses_key = f"{self.session_state_key_prefix}extracted_addresses"
-            best_address_key = f"{self.session_state_key_prefix}best_address"
-            stats_key = f"{self.session_state_key_prefix}performance_stats"
+            # 各発話の前に直前の末尾を付ける（末尾は解析結果に依存しないので先に順番どおり求められる）
+            combined_texts = []
+            for text in texts:
+                combined = self._parse_tail + text
+                combined_texts.append(combined)
+                self._parse_tail = combined[-self.parse_tail_chars:]
+            self._extract_addresses_from_texts(combined_texts)
+    
+    def _extract_addresses_from_texts(self, texts: list):
+        """複数の発話から住所をまとめて抽出し、発話の順にセッション状態へ反映"""
+        if not self.address_parser:
+            return
+        texts = [text for text in texts if text.strip()]
+        if not texts:
+            return
+        try:
+            parse_batch = getattr(self.address_parser, 'parse_batch', None)
+            if parse_batch and len(texts) > 1:
+                results = parse_batch(texts)
+            else:
+                results = [self.address_parser.extract_addresses_from_realtime_text(text) for text in texts]
+        except Exception as e:
+            logger.warning("Error extracting addresses: %s", e)
+            return
+        for addresses in results:
+            self._store_extracted_addresses(addresses)
+    
+    def _store_extracted_addresses(self, addresses: list):
+        """抽出した住所をセッション状態に保存（スレッドセーフ実装・パフォーマンス統計付き）"""
+        try:
+            addresses_key = self._keys['extracted_addresses']
+            best_address_key = self._keys['best_address']
             
-            # セッション状態の安全な更新
-            if addresses_key in st.session_state:
-                st.session_state[addresses_key] = addresses
+            # 既存の抽出結果に新しい住所だけを追加（住所文字列で重複排除）
+            merged = list(st.session_state[addresses_key])
+            known = {addr['address'] for addr in merged}
+            new_addresses = [addr for addr in addresses if addr['address'] not in known]
+            if not new_addresses:
+                return
+            merged.extend(new_addresses)
+            st.session_state[addresses_key] = merged
+            st.session_state[best_address_key] = self.address_parser.get_best_address(merged)
             
-            if best_address_key in st.session_state:
-                if addresses:
-                    best_address = self.address_parser.get_best_address(addresses)
-                    st.session_state[best_address_key] = best_address
-                    
-                    # パフォーマンス統計を更新
-                    if stats_key in st.session_state and 'processing_time' in best_address:
-                        self._update_performance_stats(best_address['processing_time'])
-                else:
-                    st.session_state[best_address_key] = None
+            # パフォーマンス統計を更新
+            latest = self.address_parser.get_best_address(new_addresses)
+            # キャッシュ由来の結果は過去の計測値なので統計に数えない
+            if 'processing_time' in latest and not latest['processing_time'].get('cache_hit'):
+                self._update_performance_stats(latest['processing_time'])
                 
+        except KeyError as e:
+            logger.warning("Session state key missing: %s", e)
         except Exception as e:
-            print(f"Error extracting addresses: {e}")
+            logger.warning("Error extracting addresses: %s", e)
     
     def _update_performance_stats(self, timing: dict):
         """パフォーマンス統計を更新"""
         try:
-            stats_key = f"{self.session_state_key_prefix}performance_stats"
-            if stats_key not in st.session_state:
-                return
-                
+            stats_key = self._keys['performance_stats']
             stats = st.session_state[stats_key]
             total_ms = timing.get('total_ms', 0)
             
             # 統計を更新
             stats['total_extractions'] += 1
+            stats['total_time_ms'] += total_ms
             stats['min_time_ms'] = min(stats['min_time_ms'], total_ms)
             stats['max_time_ms'] = max(stats['max_time_ms'], total_ms)
             
-            # 平均時間を計算
-            old_avg = stats['avg_time_ms']
-            count = stats['total_extractions']
-            stats['avg_time_ms'] = (old_avg * (count - 1) + total_ms) / count
-            
             # 500ms以下の高速処理回数をカウント
             if total_ms < 500:
                 stats['fast_extractions'] += 1
@@ -365,7 +790,7 @@ class RealtimeSpeechService:
             st.session_state[stats_key] = stats
             
         except Exception as e:
-            print(f"Error updating performance stats: {e}")
+            logger.warning("Error updating performance stats: %s", e)
     
     def _should_restart_streaming(self) -> bool:
         """ストリーミングを再開すべきかチェック"""
@@ -375,72 +800,92 @@ class RealtimeSpeechService:
         elapsed = time.time() - self.streaming_start_time
         return elapsed >= self.max_streaming_duration
     
+    def _should_prewarm_standby(self) -> bool:
+        """再接続直前で予備クライアントを暖気すべきかチェック"""
+        if self._standby_prewarmed or not self.streaming_start_time or not self.auto_reconnect_enabled:
+            return False
+        
+        elapsed = time.time() - self.streaming_start_time
+        return elapsed >= self.max_streaming_duration - self.prewarm_lead_time
+    
+    def _swap_client(self):
+        """このサービスの使用クライアントを予備側に切り替え（他のセッションには影響しない）"""
+        self._client_idx = (self._client_idx + 1) % SpeechClientPool.POOL_SIZE
+        self.client = SpeechClientPool.get_client(self._client_idx, self._credentials)
+    
     def _restart_streaming(self):
         """ストリーミングを再開"""
         try:
             # セッション状態にメッセージを設定
-            reconnect_key = f"{self.session_state_key_prefix}reconnecting"
+            reconnect_key = self._keys['reconnecting']
             if reconnect_key in st.session_state:
                 st.session_state[reconnect_key] = True
             
+            # 暖気済みの予備クライアントへ切り替え
+            self._swap_client()
+            
             # タイマーをリセット
             self.streaming_start_time = time.time()
+            self._standby_prewarmed = False
             
-            # 短い待機（音声キューをクリア）
-            time.sleep(0.2)
+            # 短い待機（停止が要求されたら即座に抜ける）
+            if self._stop_event.wait(0.2):
+                return
             
             # 再接続完了
             if reconnect_key in st.session_state:
                 st.session_state[reconnect_key] = False
                 
         except Exception as e:
-            print(f"Error during streaming restart: {e}")
+            logger.warning("Error during streaming restart: %s", e)
     
     def _handle_recognition_error(self, error_message: str):
         """認識エラーを処理"""
-        error_key = f"{self.session_state_key_prefix}error_message"
+        error_key = self._keys['error_message']
         st.session_state[error_key] = f"認識エラー: {error_message}"
-        st.session_state[f"{self.session_state_key_prefix}recognition_active"] = False
+        st.session_state[self._keys['recognition_active']] = False
     
     def stop_streaming_recognition(self):
         """リアルタイム音声認識を停止"""
         self.recording = False
+        self._stop_event.set()
+        self.audio_ring.wake()
+        self._cancel_pending_interim()
         
         # タイマーをリセット
         self.streaming_start_time = None
         
         # セッション状態を更新
-        st.session_state[f"{self.session_state_key_prefix}recognition_active"] = False
-        st.session_state[f"{self.session_state_key_prefix}reconnecting"] = False
+        st.session_state[self._keys['recognition_active']] = False
+        st.session_state[self._keys['reconnecting']] = False
         
-        # 音声キューに終了シグナルを送信
-        self.audio_queue.put(None)
-        
-        # スレッドの終了を待機
-        if self.audio_thread and self.audio_thread.is_alive():
-            self.audio_thread.join(timeout=2)
+        # 録音ストリームを停止
+        self._stop_audio_stream()
         
+        # スレッドの終了を待機（認識スレッドが最後に依頼した住所抽出まで処理してからワーカーを止める）
         if self.recognition_thread and self.recognition_thread.is_alive():
             self.recognition_thread.join(timeout=2)
+        self._stop_parse_worker()
     
     def clear_session_state(self):
         """セッション状態をクリア"""
+        self._cancel_pending_interim()
+        self._final_segments = []
+        self._final_text_cache = (0, "")
+        self._parse_tail = ""
+        self._last_final_hash = 0
+        
         keys_to_clear = [
             'interim_text', 'final_text', 'all_final_text',
             'extracted_addresses', 'best_address', 'error_message'
         ]
         
         for key in keys_to_clear:
-            full_key = f"{self.session_state_key_prefix}{key}"
+            full_key = self._keys[key]
             if full_key in st.session_state:
-                if key in ['interim_text', 'final_text', 'all_final_text', 'error_message']:
-                    st.session_state[full_key] = ""
-                elif key in ['extracted_addresses']:
-                    st.session_state[full_key] = []
-                elif key in ['best_address']:
-                    st.session_state[full_key] = None
+                st.session_state[full_key] = self._SESSION_STATE_DEFAULTS[key]()
         
-        st.session_state[f"{self.session_state_key_prefix}recognition_active"] = False
+        st.session_state[self._keys['recognition_active']] = False
     
     def get_session_state_data(self) -> dict:
         """現在のセッション状態データを取得（パフォーマンス統計含む）"""
@@ -452,15 +897,23 @@ class RealtimeSpeechService:
         ]
         
         for key in keys:
-            full_key = f"{self.session_state_key_prefix}{key}"
+            full_key = self._keys[key]
             data[key] = st.session_state.get(full_key, "")
+        # 全文はセッション状態に毎回書き写さず、断片リストから（変化があったときだけ）連結する
+        data['all_final_text'] = self.get_all_final_text()
+        
+        # 平均処理時間は合計と回数から算出
+        stats = data['performance_stats']
+        if stats:
+            count = stats['total_extractions']
+            data['performance_stats'] = {**stats, 'avg_time_ms': stats['total_time_ms'] / count if count else 0}
         
         return data
     
     def test_microphone(self) -> bool:
         """マイクのテスト"""
         try:
-            audio = pyaudio.PyAudio()
+            audio = self._get_pa()
             
             # 利用可能なデバイスをチェック
             device_count = audio.get_device_count()
@@ -482,12 +935,10 @@ class RealtimeSpeechService:
                 
                 stream.stop_stream()
                 stream.close()
-                audio.terminate()
                 
                 return len(data) > 0
                 
             except Exception:
-                audio.terminate()
                 return False
                 
         except Exception:
@@ -495,8 +946,11 @@ class RealtimeSpeechService:
     
     def get_available_devices(self) -> list:
         """利用可能な音声入力デバイスのリストを取得"""
+        if self._device_cache is not None:
+            return self._device_cache
+        
         try:
-            audio = pyaudio.PyAudio()
+            audio = self._get_pa()
             devices = []
             
             for i in range(audio.get_device_count()):
@@ -508,43 +962,32 @@ class RealtimeSpeechService:
                         'channels': device_info.get('maxInputChannels', 0)
                     })
             
-            audio.terminate()
+            self._device_cache = devices
             return devices
             
         except Exception as e:
-            print(f"Error getting audio devices: {e}")
+            logger.warning("Error getting audio devices: %s", e, exc_info=e)
             return []
     
     def _warm_up_speech_client(self):
         """Google Cloud Speech Clientを事前暖気して接続を確立"""
         try:
-            print("Google Cloud Speech API接続を暖気中...")
+            logger.info("Google Cloud Speech API接続を暖気中...")
             
-            # 最小限のダミー設定でクライアント接続をテスト
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=self.sample_rate,
-                language_code="ja-JP"
-            )
-            
-            # ストリーミング設定を作成（実際には使用しないが接続確認のため）
-            streaming_config = speech.StreamingRecognitionConfig(
-                config=config,
-                interim_results=False,
-                single_utterance=True
-            )
+            # 共有の暖気用設定で短い無音ストリームを送り接続を確立
+            SpeechClientPool.warm_up_client(self.client)
             
             # クライアント接続の暖気完了
-            print("Google Cloud Speech API暖気完了")
+            logger.info("Google Cloud Speech API暖気完了")
             
         except Exception as e:
-            print(f"Speech client warm-up failed (non-critical): {e}")
+            logger.warning("Speech client warm-up failed (non-critical): %s", e, exc_info=e)
     
     def _pre_initialize_audio(self):
         """PyAudioオーディオデバイスを事前初期化"""
         try:
-            print("オーディオデバイスを初期化中...")
-            audio = pyaudio.PyAudio()
+            logger.info("オーディオデバイスを初期化中...")
+            audio = self._get_pa()
             
             # 短時間のテストストリームを開いて即座に閉じる
             stream = audio.open(
@@ -558,23 +1001,27 @@ class RealtimeSpeechService:
             # デバイスアクセス権限とドライバ初期化
             stream.stop_stream()
             stream.close()
-            audio.terminate()
             
-            print("オーディオデバイス初期化完了")
+            logger.info("オーディオデバイス初期化完了")
             
         except Exception as e:
-            print(f"Audio pre-initialization failed (non-critical): {e}")
+            logger.warning("Audio pre-initialization failed (non-critical): %s", e, exc_info=e)
+    
+    def _warm_and_flag(self):
+        """バックグラウンドで暖気し、完了したらフラグを立てる"""
+        if self.warm_up_services():
+            self.is_warmed_up = True
     
     def warm_up_services(self):
         """全サービスの事前暖気を実行"""
         try:
-            print("音声認識サービスを暖気中...")
+            logger.info("音声認識サービスを暖気中...")
             self._warm_up_speech_client()
             self._pre_initialize_audio()
-            print("暖気処理完了 - 初回録音が高速になります")
+            logger.info("暖気処理完了 - 初回録音が高速になります")
             return True
         except Exception as e:
-            print(f"Warm-up process failed: {e}")
+            logger.warning("Warm-up process failed: %s", e, exc_info=e)
             return False
     
     def _setup_google_credentials(self):
@@ -583,64 +1030,28 @@ class RealtimeSpeechService:
             # 方法1: 環境変数からJSONを読み取り（デプロイ環境用）
             credentials_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
             if credentials_json:
-                print("環境変数からGoogle Cloud認証情報を設定中...")
+                logger.info("環境変数からGoogle Cloud認証情報を設定中...")
                 
-                # JSONの妥当性をチェック
+                # JSONを検証し、ファイルを経由せずメモリ上で認証情報を生成
                 try:
-                    json.loads(credentials_json)
-                except json.JSONDecodeError as e:
+                    info = _json_loads(credentials_json)
+                except ValueError as e:  # json/orjsonのJSONDecodeErrorはどちらもValueError
                     raise ValueError(f"GOOGLE_APPLICATION_CREDENTIALS_JSON is not valid JSON: {e}")
                 
-                # 一時ファイルを作成
-                temp_file = tempfile.NamedTemporaryFile(
-                    mode='w', 
-                    suffix='.json', 
-                    delete=False,
-                    prefix='google_credentials_'
-                )
-                
-                try:
-                    temp_file.write(credentials_json)
-                    temp_file.flush()
-                    temp_file.close()
-                    
-                    # 環境変数に一時ファイルパスを設定
-                    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = temp_file.name
-                    print(f"Google Cloud認証情報を一時ファイルに設定: {temp_file.name}")
-                    
-                    # プロセス終了時に一時ファイルを削除
-                    atexit.register(self._cleanup_temp_credentials_file, temp_file.name)
-                    
-                except Exception as e:
-                    # エラー時は一時ファイルを削除
-                    try:
-                        os.unlink(temp_file.name)
-                    except:
-                        pass
-                    raise ValueError(f"Failed to create temporary credentials file: {e}")
-                
+                self._credentials = service_account.Credentials.from_service_account_info(info)
                 return
             
             # 方法2: 既存のGOOGLE_APPLICATION_CREDENTIALS環境変数（JSONファイルパス）
             existing_credentials = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
             if existing_credentials:
                 if os.path.exists(existing_credentials):
-                    print(f"既存のGoogle Cloud認証ファイルを使用: {existing_credentials}")
+                    logger.info("既存のGoogle Cloud認証ファイルを使用: %s", existing_credentials)
                     return
                 else:
-                    print(f"警告: 指定された認証ファイルが見つかりません: {existing_credentials}")
+                    logger.warning("指定された認証ファイルが見つかりません: %s", existing_credentials)
             
             # 方法3: デフォルト認証（gcloud CLI or 自動認証）
-            print("Google Cloud Application Default Credentials を使用")
+            logger.info("Google Cloud Application Default Credentials を使用")
             
         except Exception as e:
             raise ValueError(f"Google Cloud認証の設定に失敗しました: {e}")
-    
-    def _cleanup_temp_credentials_file(self, file_path: str):
-        """一時認証ファイルをクリーンアップ"""
-        try:
-            if os.path.exists(file_path):
-                os.unlink(file_path)
-                print(f"一時認証ファイルを削除: {file_path}")
-        except Exception as e:
-            print(f"一時認証ファイルの削除に失敗: {e}")
\ No newline at end of file
@@ -1,12 +1,41 @@
 import os
 import io
+import asyncio
+import collections
+import concurrent.futures
+import html
+import queue
+import threading
+import time
 import sounddevice as sd
+import soundfile as sf
 import numpy as np
-from typing import Optional, Tuple
-import tempfile
-import wave
+from typing import List, Optional, Tuple
 from google.cloud import speech
 from google.cloud import texttospeech
+from google.cloud import texttospeech_v1beta1
+from google.cloud.speech_v1 import SpeechAsyncClient
+from google.cloud.speech_v1.services.speech.transports import SpeechGrpcTransport, SpeechGrpcAsyncIOTransport
+from google.cloud.texttospeech import TextToSpeechAsyncClient
+from google.cloud.texttospeech_v1.services.text_to_speech.transports import (
+    TextToSpeechGrpcTransport,
+    TextToSpeechGrpcAsyncIOTransport,
+)
+try:
+    import webrtcvad
+except ImportError:
+    # VAD未導入時は指定時間いっぱい録音
+    webrtcvad = None
+
+# 切断検知用のkeepalive設定
+# ストリームは295秒で張り直すので、その間に数回pingが届くよう30秒間隔にする
+# Googleのフロントエンドは RPC のない間の ping を許可しておらず、超過すると GOAWAY(too_many_pings) で
+# 切断されて逆に再接続が増えるため、ping は RPC 実行中だけに限り、データのない間の回数も gRPC の既定値に任せる
+_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 0),
+]
 
 class GoogleSpeechService:
     def __init__(self):
@@ -15,14 +44,38 @@ class GoogleSpeechService:
         if not self.project_id:
             raise ValueError("Google Cloud Project ID not found. Please set GOOGLE_CLOUD_PROJECT_ID environment variable.")
         
-        # Google Cloud clients
-        self.speech_client = speech.SpeechClient()
-        self.tts_client = texttospeech.TextToSpeechClient()
+        # Google Cloud clients（エンドポイントは環境変数で地域エンドポイントに変更可能）
+        self.speech_endpoint = os.getenv("GOOGLE_SPEECH_ENDPOINT", "speech.googleapis.com:443")
+        self.tts_endpoint = os.getenv("GOOGLE_TTS_ENDPOINT", "texttospeech.googleapis.com:443")
+        self.speech_client = speech.SpeechClient(transport=SpeechGrpcTransport(
+            channel=SpeechGrpcTransport.create_channel(self.speech_endpoint, options=_CHANNEL_OPTIONS)
+        ))
+        self.tts_client = texttospeech.TextToSpeechClient(transport=TextToSpeechGrpcTransport(
+            channel=TextToSpeechGrpcTransport.create_channel(self.tts_endpoint, options=_CHANNEL_OPTIONS)
+        ))
+        
+        # 非同期クライアント用のイベントループ（バックグラウンドスレッドで常駐）
+        self.rpc_timeout = 30
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+        self.speech_async_client, self.tts_async_client = asyncio.run_coroutine_threadsafe(
+            self._create_async_clients(), self._loop
+        ).result()
         
         # Audio Config
         self.sample_rate = int(os.getenv("AUDIO_SAMPLE_RATE", 16000))
         self.channels = int(os.getenv("AUDIO_CHANNELS", 1))
         
+        # 録音バッファは事前確保して使い回す（最大録音時間ぶん）
+        self.max_duration_s = 60
+        self._capture_buf = np.empty((self.sample_rate * self.max_duration_s, self.channels), dtype=np.int16)
+        
+        # 発話後の無音が続いたら録音を打ち切る（webrtcvadはモノラルのみ対応）
+        self._vad = webrtcvad.Vad(2) if webrtcvad and self.channels == 1 else None
+        self.vad_frame_ms = 20
+        self.vad_silence_ms = 500
+        
         # Japanese voice configuration for TTS
         self.voice = texttospeech.VoiceSelectionParams(
             language_code="ja-JP",
@@ -30,12 +83,128 @@ class GoogleSpeechService:
             ssml_gender=texttospeech.SsmlVoiceGender.FEMALE
         )
         
-        # Audio config for TTS
+        # Audio config for TTS（転送量を抑えるためOGG_OPUSで受け取りローカルでデコード）
         self.audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.LINEAR16,
+            audio_encoding=texttospeech.AudioEncoding.OGG_OPUS,
             sample_rate_hertz=self.sample_rate
         )
         
+        # ストリーミング合成用設定（streaming_synthesizeはChirp 3 HD音声のみ対応）
+        self.streaming_synthesize_config = texttospeech.StreamingSynthesizeConfig(
+            voice=texttospeech.VoiceSelectionParams(
+                language_code="ja-JP",
+                name="ja-JP-Chirp3-HD-Aoede"
+            ),
+            streaming_audio_config=texttospeech.StreamingAudioConfig(
+                audio_encoding=texttospeech.AudioEncoding.PCM,
+                sample_rate_hertz=self.sample_rate
+            )
+        )
+        
+        # 同じ文言の合成結果はキャッシュして再利用（イベントループ上でのみ操作）
+        self._tts_cache = collections.OrderedDict()
+        self.tts_cache_size = 256
+        
+        # 再生用の出力ストリーム（初回再生時に開いて使い回す）
+        self._out = None
+        self._out_lock = threading.Lock()
+        
+        # SSMLマーク位置の取得はv1beta1のみ対応（まとめて合成する時だけ生成）
+        self._tts_beta_client = None
+        
+        # 認識モデル（短い住所の発話向けにlatest_short、長文ならSTT_MODEL=latest_long）
+        # 句読点はフォールバック住所パーサーが区切りに使うため有効のまま
+        self.stt_model = os.getenv("STT_MODEL", "latest_short")
+        self.recognition_config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=self.sample_rate,
+            language_code="ja-JP",
+            enable_automatic_punctuation=True,
+            model=self.stt_model
+        )
+        
+        # ストリーミング認識設定（最初の発話が確定したら終了）
+        self.streaming_config = speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=self.sample_rate,
+                language_code="ja-JP",
+                enable_automatic_punctuation=True,
+                audio_channel_count=self.channels,
+                model=self.stt_model
+            ),
+            interim_results=True,
+            single_utterance=True
+        )
+        
+        # 接続の暖気はバックグラウンドで実行して__init__をブロックしない
+        asyncio.run_coroutine_threadsafe(self._warm_up_async(), self._loop)
+    
+    async def _create_async_clients(self):
+        """非同期クライアントをイベントループ上で生成"""
+        speech_channel = SpeechGrpcAsyncIOTransport.create_channel(self.speech_endpoint, options=_CHANNEL_OPTIONS)
+        tts_channel = TextToSpeechGrpcAsyncIOTransport.create_channel(self.tts_endpoint, options=_CHANNEL_OPTIONS)
+        return (
+            SpeechAsyncClient(transport=SpeechGrpcAsyncIOTransport(channel=speech_channel)),
+            TextToSpeechAsyncClient(transport=TextToSpeechGrpcAsyncIOTransport(channel=tts_channel)),
+        )
+    
+    async def _warm_up_async(self):
+        """TLS・HTTP/2接続を事前に確立（初回のRPC遅延を隠す）"""
+        try:
+            await self.tts_async_client.synthesize_speech(
+                input=texttospeech.SynthesisInput(text="。"),
+                voice=self.voice,
+                audio_config=self.audio_config,
+                timeout=self.rpc_timeout
+            )
+        except Exception as e:
+            print(f"TTS warm-up failed (non-critical): {e}")
+    
+    def stream_recognize(self, max_duration: int = 10) -> Tuple[bool, str]:
+        """
+        STT: 録音しながら音声を逐次送信し、最初の確定結果を返す
+        
+        Args:
+            max_duration: 最大録音時間（秒）
+            
+        Returns:
+            (成功フラグ, 認識されたテキスト)
+        """
+        audio_queue = queue.Queue()
+        
+        def callback(indata, frames, time_info, status):
+            audio_queue.put(indata.tobytes())
+        
+        def request_generator():
+            deadline = time.monotonic() + max_duration
+            while time.monotonic() < deadline:
+                try:
+                    chunk = audio_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                yield speech.StreamingRecognizeRequest(audio_content=chunk)
+        
+        try:
+            # 約100msごとに録音データを受け取り、そのまま送信する
+            with sd.InputStream(
+                samplerate=self.sample_rate,
+                channels=self.channels,
+                dtype='int16',
+                blocksize=int(0.1 * self.sample_rate),
+                callback=callback
+            ):
+                responses = self.speech_client.streaming_recognize(self.streaming_config, request_generator())
+                for response in responses:
+                    for result in response.results:
+                        if result.is_final and result.alternatives:
+                            return True, result.alternatives[0].transcript
+            
+            return False, "音声を認識できませんでした。"
+        
+        except Exception as e:
+            return False, f"STTエラー: {str(e)}"
+    
     def record_audio(self, duration: int = 10) -> np.ndarray:
         """
         マイクから音声を録音
@@ -44,37 +213,75 @@ class GoogleSpeechService:
             duration: 録音時間（秒）
             
         Returns:
-            録音された音声データ
+            録音された音声データ（内部バッファのビュー、次回録音で上書きされる）
         """
         print(f"Recording for {duration} seconds...")
-        audio_data = sd.rec(
-            int(duration * self.sample_rate), 
-            samplerate=self.sample_rate, 
+        n = int(duration * self.sample_rate)
+        if n > len(self._capture_buf):
+            self._capture_buf = np.empty((n, self.channels), dtype=np.int16)
+        
+        if self._vad is None:
+            sd.rec(out=self._capture_buf[:n], samplerate=self.sample_rate)
+            sd.wait()  # 録音完了まで待機
+            return self._capture_buf[:n].reshape(-1)
+        
+        return self._record_until_silence(n)
+    
+    def _record_until_silence(self, max_frames: int) -> np.ndarray:
+        """発話後に一定時間の無音が続くか最大長に達するまで録音"""
+        buf = self._capture_buf
+        frame_size = self.sample_rate * self.vad_frame_ms // 1000
+        silence_limit = self.sample_rate * self.vad_silence_ms // 1000
+        state = {'pos': 0, 'heard_speech': False, 'silence': 0}
+        finished = threading.Event()
+        
+        def callback(indata, frames, time_info, status):
+            pos = state['pos']
+            count = min(frames, max_frames - pos)
+            buf[pos:pos + count] = indata[:count]
+            state['pos'] = pos + count
+            
+            if self._vad.is_speech(indata.tobytes(), self.sample_rate):
+                state['heard_speech'] = True
+                state['silence'] = 0
+            elif state['heard_speech']:
+                state['silence'] += frames
+            
+            if state['pos'] >= max_frames or state['silence'] >= silence_limit:
+                raise sd.CallbackStop
+        
+        with sd.InputStream(
+            samplerate=self.sample_rate,
             channels=self.channels,
-            dtype=np.int16
-        )
-        sd.wait()  # 録音完了まで待機
-        return audio_data.flatten()
+            dtype='int16',
+            blocksize=frame_size,
+            callback=callback,
+            finished_callback=finished.set
+        ):
+            finished.wait()
+        
+        return buf[:state['pos']].reshape(-1)
+    
+    def _to_pcm_bytes(self, audio_data: np.ndarray) -> bytes:
+        """音声データをLINEAR16のbytesに変換（record_audioの結果は既にint16なので変換不要）"""
+        if audio_data.dtype != np.int16:
+            audio_data = (audio_data * 32767).astype(np.int16)
+        # encodingとsample_rate_hertzを指定すればRIFFヘッダ無しの生PCMをそのまま渡せる
+        return audio_data.tobytes()
     
-    def save_audio_to_wav(self, audio_data: np.ndarray) -> str:
+    def submit_speech_to_text(self, audio_data: np.ndarray) -> concurrent.futures.Future:
         """
-        音声データをWAVファイルとして一時的に保存
+        STTをバックグラウンドで実行（次の録音と並行できる）
         
         Args:
             audio_data: 音声データ
             
         Returns:
-            WAVファイルのパス
+            (成功フラグ, 認識されたテキスト) を返すFuture
         """
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        
-        with wave.open(temp_file.name, 'wb') as wav_file:
-            wav_file.setnchannels(self.channels)
-            wav_file.setsampwidth(2)  # 16-bit
-            wav_file.setframerate(self.sample_rate)
-            wav_file.writeframes(audio_data.tobytes())
-        
-        return temp_file.name
+        # 録音バッファは次回録音で上書きされるので、ここでbytesに確定させる
+        audio_bytes = self._to_pcm_bytes(audio_data)
+        return asyncio.run_coroutine_threadsafe(self.speech_to_text_async(audio_bytes), self._loop)
     
     def speech_to_text(self, audio_data: np.ndarray) -> Tuple[bool, str]:
         """
@@ -86,29 +293,25 @@ class GoogleSpeechService:
         Returns:
             (成功フラグ, 認識されたテキスト)
         """
-        try:
-            # 音声データをbytesに変換
-            if audio_data.dtype != np.int16:
-                audio_int16 = (audio_data * 32767).astype(np.int16)
-            else:
-                audio_int16 = audio_data
-            audio_bytes = audio_int16.tobytes()
-            
-            # Google Cloud Speech認識設定
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=self.sample_rate,
-                language_code="ja-JP",
-                enable_automatic_punctuation=True,
-                model="latest_long"
-            )
+        return self.submit_speech_to_text(audio_data).result()
+    
+    async def speech_to_text_async(self, audio_bytes: bytes) -> Tuple[bool, str]:
+        """
+        STT: LINEAR16音声を非同期でテキストに変換
+        
+        Args:
+            audio_bytes: LINEAR16音声データ
             
+        Returns:
+            (成功フラグ, 認識されたテキスト)
+        """
+        try:
             audio = speech.RecognitionAudio(content=audio_bytes)
             
             # 音声認識実行
-            response = self.speech_client.recognize(
-                config=config,
-                audio=audio
+            response = await asyncio.wait_for(
+                self.speech_async_client.recognize(config=self.recognition_config, audio=audio),
+                timeout=self.rpc_timeout
             )
             
             if response.results:
@@ -121,10 +324,104 @@ class GoogleSpeechService:
         except Exception as e:
             return False, f"STTエラー: {str(e)}"
     
+    async def _synthesize_async(self, text: str) -> bytes:
+        """テキストを音声合成して音声データを返す（同じ文言はキャッシュから取得）"""
+        if text in self._tts_cache:
+            self._tts_cache.move_to_end(text)
+            return self._tts_cache[text]
+        
+        synthesis_input = texttospeech.SynthesisInput(text=text)
+        response = await asyncio.wait_for(
+            self.tts_async_client.synthesize_speech(
+                input=synthesis_input,
+                voice=self.voice,
+                audio_config=self.audio_config
+            ),
+            timeout=self.rpc_timeout
+        )
+        
+        self._tts_cache[text] = response.audio_content
+        if len(self._tts_cache) > self.tts_cache_size:
+            self._tts_cache.popitem(last=False)
+        return response.audio_content
+    
+    def _get_output_stream(self) -> sd.OutputStream:
+        """再生用の出力ストリームを取得（毎回デバイスを開閉しない）"""
+        if self._out is None:
+            self._out = sd.OutputStream(samplerate=self.sample_rate, channels=1, dtype='int16')
+            self._out.start()
+        return self._out
+    
+    def _write_pcm(self, audio_data: np.ndarray):
+        """int16 PCMを出力ストリームへ書き込む（書き終わるまでブロック）"""
+        with self._out_lock:
+            self._get_output_stream().write(audio_data)
+    
+    def _play_audio(self, audio_content: bytes):
+        """OGG_OPUSをデコードして再生（完了までブロック）"""
+        # OGG_OPUSをint16 PCMにデコード
+        audio_data, sample_rate = sf.read(io.BytesIO(audio_content), dtype='int16')
+        
+        if sample_rate == self.sample_rate and audio_data.ndim == 1:
+            self._write_pcm(audio_data)
+        else:
+            # 出力ストリームと形式が異なる場合のみ都度再生
+            sd.play(audio_data, samplerate=sample_rate)
+            sd.wait()  # 再生完了まで待機
+    
+    def close(self):
+        """出力ストリーム・非同期クライアントのチャネル・イベントループを閉じる"""
+        with self._out_lock:
+            if self._out is not None:
+                self._out.stop()
+                self._out.close()
+                self._out = None
+        
+        if self._loop.is_closed():
+            return
+        # 非同期チャネルは作成したループ上で閉じる必要がある
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_async_clients(), self._loop).result(timeout=5)
+        except Exception as e:
+            print(f"Async client close failed: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=5)
+        if not self._loop_thread.is_alive():
+            self._loop.close()
+    
+    async def _close_async_clients(self):
+        """非同期クライアントのgRPCチャネルを閉じる"""
+        await self.speech_async_client.transport.close()
+        await self.tts_async_client.transport.close()
+    
+    def submit_text_to_speech(self, text: str) -> concurrent.futures.Future:
+        """
+        TTSをバックグラウンドで実行（UI更新と並行できる）
+        
+        Args:
+            text: 読み上げるテキスト
+            
+        Returns:
+            (成功フラグ, メッセージ) を返すFuture
+        """
+        return asyncio.run_coroutine_threadsafe(self.text_to_speech_async(text), self._loop)
+    
     def text_to_speech(self, text: str) -> Tuple[bool, str]:
         """
         TTS: テキストを音声に変換して再生 (Google Cloud Text-to-Speech)
         
+        Args:
+            text: 読み上げるテキスト
+            
+        Returns:
+            (成功フラグ, メッセージ)
+        """
+        return self.submit_text_to_speech(text).result()
+    
+    async def text_to_speech_async(self, text: str) -> Tuple[bool, str]:
+        """
+        TTS: テキストを非同期で音声合成して再生
+        
         Args:
             text: 読み上げるテキスト
             
@@ -132,28 +429,96 @@ class GoogleSpeechService:
             (成功フラグ, メッセージ)
         """
         try:
-            # 合成するテキストを設定
-            synthesis_input = texttospeech.SynthesisInput(text=text)
+            audio_content = await self._synthesize_async(text)
             
-            # 音声合成実行
-            response = self.tts_client.synthesize_speech(
-                input=synthesis_input,
-                voice=self.voice,
-                audio_config=self.audio_config
-            )
+            # 再生はブロッキングなのでループを塞がないようスレッドで実行
+            await asyncio.get_running_loop().run_in_executor(None, self._play_audio, audio_content)
             
-            # 音声データをnumpy arrayに変換
-            audio_data = np.frombuffer(response.audio_content, dtype=np.int16)
+            return True, "音声の再生が完了しました。"
+                
+        except Exception as e:
+            return False, f"TTSエラー: {str(e)}"
+    
+    def stream_text_to_speech(self, text: str) -> Tuple[bool, str]:
+        """
+        TTS: ストリーミング合成し、最初のチャンクから再生を開始
+        
+        Args:
+            text: 読み上げるテキスト
             
-            # sounddeviceで音声を再生
-            sd.play(audio_data, samplerate=self.sample_rate)
-            sd.wait()  # 再生完了まで待機
+        Returns:
+            (成功フラグ, メッセージ)
+        """
+        def request_generator():
+            yield texttospeech.StreamingSynthesizeRequest(streaming_config=self.streaming_synthesize_config)
+            # 文単位で送り、先頭の文から合成を始めさせる
+            for sentence in text.replace("。", "。\n").splitlines():
+                if sentence.strip():
+                    yield texttospeech.StreamingSynthesizeRequest(
+                        input=texttospeech.StreamingSynthesisInput(text=sentence)
+                    )
+        
+        try:
+            for response in self.tts_client.streaming_synthesize(request_generator()):
+                # bytesをコピーせずint16として共有出力ストリームへ
+                self._write_pcm(np.frombuffer(response.audio_content, dtype=np.int16))
             
             return True, "音声の再生が完了しました。"
-                
+        
         except Exception as e:
             return False, f"TTSエラー: {str(e)}"
     
+    def synthesize_batch(self, texts: List[str]) -> List[bytes]:
+        """
+        複数の文言を1回のTTS呼び出しでまとめて合成し、文言ごとに分割
+        
+        Args:
+            texts: 読み上げるテキストのリスト
+            
+        Returns:
+            文言ごとのint16 PCM音声データ（self.sample_rate）
+        """
+        if not texts:
+            return []
+        
+        if self._tts_beta_client is None:
+            self._tts_beta_client = texttospeech_v1beta1.TextToSpeechClient()
+        
+        # 各文言の先頭に<mark>を置き、返ってきた時刻で音声を切り分ける
+        ssml = "<speak>" + "".join(
+            f'<mark name="{i}"/>{html.escape(text)}' for i, text in enumerate(texts)
+        ) + "</speak>"
+        
+        response = self._tts_beta_client.synthesize_speech(
+            request=texttospeech_v1beta1.SynthesizeSpeechRequest(
+                input=texttospeech_v1beta1.SynthesisInput(ssml=ssml),
+                voice=texttospeech_v1beta1.VoiceSelectionParams(
+                    language_code=self.voice.language_code,
+                    name=self.voice.name
+                ),
+                audio_config=texttospeech_v1beta1.AudioConfig(
+                    audio_encoding=texttospeech_v1beta1.AudioEncoding.OGG_OPUS,
+                    sample_rate_hertz=self.sample_rate
+                ),
+                enable_time_pointing=[
+                    texttospeech_v1beta1.SynthesizeSpeechRequest.TimepointType.SSML_MARK
+                ]
+            ),
+            timeout=self.rpc_timeout
+        )
+        
+        audio_data, sample_rate = sf.read(io.BytesIO(response.audio_content), dtype='int16')
+        mark_times = {tp.mark_name: tp.time_seconds for tp in response.timepoints}
+        
+        # マークが欠けた区間は直前の区間に含める
+        bounds = [0]
+        for i in range(1, len(texts)):
+            t = mark_times.get(str(i))
+            bounds.append(int(t * sample_rate) if t is not None else bounds[-1])
+        bounds.append(len(audio_data))
+        
+        return [audio_data[start:end].tobytes() for start, end in zip(bounds, bounds[1:])]
+    
     def test_connection(self) -> Tuple[bool, str]:
         """
         Google Cloud Speech Servicesのテスト
@@ -1,4 +1,12 @@
+import bisect
+import collections
+import concurrent.futures
+import functools
+import operator
+import os
 import re
+import sys
+import threading
 import time
 from typing import List, Dict, Optional, Tuple
 try:
@@ -7,6 +15,219 @@ except ImportError as e:
     # フォールバック用の簡易パーサー
     print(f"Warning: japanese-address-parser-py not available: {e}")
     Parser = None
+try:
+    import ahocorasick
+except ImportError:
+    # 未導入時は正規表現の選択パターンで都道府県を探す
+    ahocorasick = None
+
+# 都道府県リスト（結果の都道府県名は常にこのタプルの文字列を共有する）
+_PREFECTURES = tuple(sys.intern(p) for p in (
+    "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県",
+    "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県", "東京都", "神奈川県",
+    "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県",
+    "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県",
+    "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県",
+    "徳島県", "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県",
+    "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県"
+))
+
+# 住所を含まないテキストを正規表現・パーサーの前に弾くための文字集合
+_PREFECTURE_SUFFIX_CHARS = frozenset("都道府県")
+_CITY_SUFFIX_CHARS = frozenset("市区町村")
+_DIGIT_CHARS = frozenset("0123456789０１２３４５６７８９")
+# いずれも含まないテキストからは住所も郵便番号も抽出され得ない
+_ADDRESS_HINT_CHARS = _PREFECTURE_SUFFIX_CHARS | _CITY_SUFFIX_CHARS | _DIGIT_CHARS
+# 空白だけのテキストもこの判定で弾ける（strip() の複製が不要）
+
+# 正規表現は呼び出しごとに組み立てずモジュール読み込み時にコンパイル
+# 都道府県名に続く住所の残り部分（Aho-Corasick経路と正規表現経路で共通）
+_ADDRESS_TAIL = r'[^。、]*?(?:市|区|町|村)[^。、]*?(?:\d+[丁目町][^。、]*?)?'
+_ADDRESS_RE = re.compile('(' + '|'.join(_PREFECTURES) + ')' + _ADDRESS_TAIL)
+_ADDRESS_TAIL_RE = re.compile(_ADDRESS_TAIL)
+# 都道府県名の先頭文字（正規表現経路でこれ以外の位置からの照合を省く）
+_PREFECTURE_START_RE = re.compile('[' + ''.join(sorted({p[0] for p in _PREFECTURES})) + ']')
+_HAS_DIGIT_RE = re.compile(r'\d+')
+_CHOME_RE = re.compile(r'\d+[丁目町]')
+_CITY_RE = re.compile(r'[市区町村]')
+_POSTAL_RE = re.compile(r'(?:〒\s*)?(\d{3}[-−ー]?\d{4})')
+# 郵便番号の区切り（−・ー）を半角ハイフンへ正規化する変換表
+_HYPHEN_TABLE = str.maketrans({'−': '-', 'ー': '-'})
+
+# 建物詳細抽出用パターン（先に一致したものを採用）
+# 毎回の属性参照を省くため、コンパイル済みパターンのsearchメソッドを並べておく
+_BLOCK_SEARCHES = tuple(re.compile(p).search for p in (
+    r'(\d+[-−ー]\d+[-−ー]\d+)',  # 1-2-3形式
+    r'(\d+[-−ー]\d+)',           # 1-2形式
+    r'(\d+番地\d+号)',           # 10番地5号形式
+    r'(\d+番\d+号)',            # 10番5号形式
+))
+_BUILDING_SEARCHES = tuple(re.compile(p).search for p in (
+    r'([^\d]+(?:マンション|ハイツ|コーポ|アパート|ビル|タワー|レジデンス|プラザ|ヒルズ|パーク|ガーデン|テラス|ホームズ|ヴィラ))',
+    r'([^\d]+(?:荘|寮|社宅|官舎))',
+    r'([A-Za-z\s]+(?:マンション|ハイツ|コーポ|アパート|ビル|タワー|レジデンス))',
+))
+_ROOM_SEARCHES = tuple(re.compile(p).search for p in (
+    r'(\d+号室)',              # 101号室
+    r'(\d+号)',                # 101号
+    r'(\d+F[-−ー]\d+)',        # 3F-205
+    r'(\d+階\d+号)',           # 3階205号
+    r'([A-Z]\d+)',             # A101
+    r'(\d+[A-Z])',             # 101A
+    r'(\d+-[A-Z])',            # 2-A
+))
+_FLOOR_SEARCHES = tuple(re.compile(p).search for p in (
+    r'(\d+階)',                # 5階
+    r'(\d+F)',                 # 5F
+))
+_BASEMENT_RE = re.compile(r'B(\d+)')  # B1（地下）
+# 建物名パターンはいずれもこの語尾を含む（無ければ建物名パターンをまとめて省略）
+_BUILDING_HINT_RE = re.compile(r'マンション|ハイツ|コーポ|アパート|ビル|タワー|レジデンス|プラザ|ヒルズ|パーク|ガーデン|テラス|ホームズ|ヴィラ|荘|寮|社宅|官舎')
+
+# 最適住所選択時のタイプ優先度
+_TYPE_PRIORITY = {
+    'toriyama_parsed': 3,
+    'fallback_parsed': 2,
+    'postal_code_detected': 1
+}
+_KEY = operator.itemgetter(0)
+
+# 住所情報の共通項目（各成分が空の候補はこれをコピーして必要な項目だけ書き換える）
+_EMPTY_ADDRESS_INFO = {
+    'type': '',
+    'address': '',
+    'prefecture': '',
+    'city': '',
+    'town': '',
+    'rest': '',
+    'building_name': '',
+    'room_number': '',
+    'floor': '',
+    'block_number': '',
+    'confidence': 0.0,
+    'is_complete': False,
+    'source_text': ''
+}
+
+# 処理時間（ms）の区切りと評価（区切り未満ならその位置の評価）
+_PERF_THRESHOLDS = (100, 500, 1000)
+_PERF_LEVELS = ("超高速", "高速", "標準", "低速")
+_PERF_COLORS = {
+    "超高速": "🟢",
+    "高速": "🔵",
+    "標準": "🟠",
+    "低速": "🔴"
+}
+
+
+def _build_prefecture_automaton():
+    """都道府県名のAho-Corasickオートマトンを構築（ライブラリ未導入ならNone）"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for prefecture in _PREFECTURES:
+        # 一致位置（末尾）から開始位置を引き算だけで求められるよう長さも持たせる
+        automaton.add_word(prefecture, (len(prefecture) - 1, prefecture))
+    automaton.make_automaton()
+    return automaton
+
+_PREFECTURE_AUTOMATON = _build_prefecture_automaton()
+
+# 解析をUIスレッドから外すためのスレッドプール（Rust側はGILを解放する）
+# Streamlitはセッションごとにパーサーを作るので、スレッドが溜まらないよう全パーサーで共有する
+_PARSE_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=min(4, os.cpu_count() or 1),
+    thread_name_prefix="address-parser"
+)
+
+
+def _iter_address_matches(text: str):
+    """都道府県から始まる住所候補を (住所文字列, 都道府県) で列挙"""
+    if _PREFECTURE_AUTOMATON is None:
+        # 都道府県の先頭文字がある位置でだけ住所パターンを照合する
+        find_start = _PREFECTURE_START_RE.search
+        match_address = _ADDRESS_RE.match
+        start = find_start(text)
+        while start:
+            match = match_address(text, start.start())
+            if match:
+                yield match.group(0), sys.intern(match.group(1))
+                start = find_start(text, match.end())
+            else:
+                start = find_start(text, start.start() + 1)
+        return
+    
+    # 1パスで都道府県を見つけ、その後ろだけ正規表現で補完する
+    pos = 0
+    match_tail = _ADDRESS_TAIL_RE.match
+    for end_idx, (offset, prefecture) in _PREFECTURE_AUTOMATON.iter(text):
+        start = end_idx - offset
+        if start < pos:
+            continue  # 直前の住所に含まれる位置
+        match = match_tail(text, end_idx + 1)
+        if match:
+            yield text[start:match.end()], prefecture
+            pos = match.end()
+
+
+@functools.lru_cache(maxsize=1024)
+def _building_details(rest_text: str) -> Tuple[str, str, str, str]:
+    """(建物名, 部屋番号, 階数, 番地) を抽出（途中結果で同じ残り部分が続くのでキャッシュ）"""
+    building_name = room_number = floor = block_number = ''
+    
+    if not rest_text:
+        return building_name, room_number, floor, block_number
+    
+    # 建物名パターンの抽出
+    if _BUILDING_HINT_RE.search(rest_text):
+        for search in _BUILDING_SEARCHES:
+            match = search(rest_text)
+            if match:
+                building_name = match.group(1).strip()
+                break
+    
+    # 番地・部屋番号・階数のパターンはすべて数字を含む
+    if not _HAS_DIGIT_RE.search(rest_text):
+        return building_name, room_number, floor, block_number
+    
+    # 番地パターンの抽出（例: 1-2-3, 10番地5号）
+    for search in _BLOCK_SEARCHES:
+        match = search(rest_text)
+        if match:
+            block_number = match.group(1)
+            break
+    
+    # 部屋番号パターンの抽出
+    for search in _ROOM_SEARCHES:
+        match = search(rest_text)
+        if match:
+            room_number = match.group(1)
+            break
+    
+    # 階数パターンの抽出
+    for search in _FLOOR_SEARCHES:
+        match = search(rest_text)
+        if match:
+            floor = match.group(1)
+            break
+    else:
+        match = _BASEMENT_RE.search(rest_text)
+        if match:
+            floor = f"B{match.group(1)}"
+    
+    return building_name, room_number, floor, block_number
+
+def _copy_addresses(addresses: List[Dict], cache_hit: bool = False) -> List[Dict]:
+    """キャッシュと共有しない複製を作成（入れ子のprocessing_timeも複製、キャッシュ由来なら印を付ける）"""
+    copies = []
+    for address in addresses:
+        copy = dict(address)
+        timing = address.get('processing_time')
+        if timing is not None:
+            # キャッシュ由来の処理時間は過去の計測値なので、統計に数えないよう cache_hit を付ける
+            copy['processing_time'] = dict(timing, cache_hit=True) if cache_hit else dict(timing)
+        copies.append(copy)
+    return copies
 
 class ToriyamaAddressParser:
     def __init__(self):
@@ -14,6 +235,16 @@ class ToriyamaAddressParser:
         self.parser = None
         self.parser_available = False
         
+        # 最近解析したテキストの結果（同じ途中結果が続いたり行き来したりしても再解析しない）
+        self._parse_cache = collections.OrderedDict()
+        self.parse_cache_size = 256
+        self.parse_cache_max_text = 4096  # これより長いテキストはキャッシュしない
+        self._parse_cache_lock = threading.Lock()
+        
+        # Trueのときだけ工程別（パーサー・建物詳細・信頼度）の処理時間を計測する
+        # 通常は全体の処理時間（total_ms）のみ
+        self.debug_timing = False
+        
         try:
             if Parser:
                 self.parser = Parser()
@@ -40,9 +271,18 @@ class ToriyamaAddressParser:
         
         addresses = []
         
-        if not text.strip():
+        if not text or _ADDRESS_HINT_CHARS.isdisjoint(text):
             return addresses
         
+        cacheable = len(text) <= self.parse_cache_max_text
+        if cacheable:
+            with self._parse_cache_lock:
+                cached = self._parse_cache.get(text)
+                if cached is not None:
+                    self._parse_cache.move_to_end(text)
+            if cached is not None:
+                return _copy_addresses(cached, cache_hit=True)
+        
         if self.parser_available:
             # @toriyama/japanese-address-parserを使用
             addresses = self._extract_with_toriyama_parser(text)
@@ -55,60 +295,109 @@ class ToriyamaAddressParser:
         total_time_ms = (end_time - start_time) * 1000
         
         # 各アドレスに処理時間情報を追加
-        for address in addresses:
-            if 'processing_time' not in address:
-                address['processing_time'] = {}
-            address['processing_time']['total_ms'] = total_time_ms
-            address['processing_time']['performance_level'] = self._evaluate_performance(total_time_ms)
-            address['timestamp'] = end_time
-        
+        if addresses:
+            performance_level = self._evaluate_performance(total_time_ms)
+            for address in addresses:
+                if 'processing_time' not in address:
+                    address['processing_time'] = {}
+                address['processing_time']['total_ms'] = total_time_ms
+                address['processing_time']['performance_level'] = performance_level
+                address['timestamp'] = end_time
+        
+        if cacheable:
+            with self._parse_cache_lock:
+                self._parse_cache[text] = addresses
+                if len(self._parse_cache) > self.parse_cache_size:
+                    self._parse_cache.popitem(last=False)
+            # 呼び出し側が書き換えてもキャッシュが壊れないよう複製を返す
+            return _copy_addresses(addresses)
         return addresses
     
+    def parse_async(self, text: str) -> concurrent.futures.Future:
+        """
+        住所抽出をスレッドプールで実行（途中結果と確定結果を並列に解析できる）
+        
+        Args:
+            text: リアルタイム音声認識テキスト
+            
+        Returns:
+            抽出された住所情報のリストを返すFuture
+        """
+        return _PARSE_POOL.submit(self.extract_addresses_from_realtime_text, text)
+    
+    def parse_batch(self, texts: List[str]) -> List[List[Dict]]:
+        """
+        複数の発話をまとめて住所抽出（Rust側はGILを解放するのでスレッドで並列化）
+        
+        Args:
+            texts: リアルタイム音声認識テキストのリスト
+            
+        Returns:
+            各テキストに対応する住所情報リストのリスト（入力と同じ順序）
+        """
+        # 同じテキストは1回だけ解析する
+        unique_texts = list(dict.fromkeys(texts))
+        if len(unique_texts) == 1:
+            results = [self.extract_addresses_from_realtime_text(unique_texts[0])]
+        else:
+            results = list(_PARSE_POOL.map(self.extract_addresses_from_realtime_text, unique_texts))
+        by_text = dict(zip(unique_texts, results))
+        return [by_text[text] for text in texts]
+    
     def _extract_with_toriyama_parser(self, text: str) -> List[Dict]:
         """@toriyama/japanese-address-parserを使用した住所抽出（詳細時間計測付き）"""
         addresses = []
         timing = {}
+        now = time.perf_counter if self.debug_timing else None
         
         try:
-            # パーサー処理時間の計測
-            parser_start = time.perf_counter()
-            result = self.parser.parse(text)
-            parser_end = time.perf_counter()
-            timing['parser_ms'] = (parser_end - parser_start) * 1000
+            # 都道府県・市区町村の文字が無ければパーサーを呼ばない
+            if _PREFECTURE_SUFFIX_CHARS.isdisjoint(text) and _CITY_SUFFIX_CHARS.isdisjoint(text):
+                result = None
+                if now:
+                    timing['parser_ms'] = 0
+            elif now:
+                # パーサー処理時間の計測
+                parser_start = now()
+                result = self.parser.parse(text)
+                timing['parser_ms'] = (now() - parser_start) * 1000
+            else:
+                result = self.parser.parse(text)
             
-            if result and hasattr(result, 'address'):
-                address_data = result.address
+            # 属性の有無確認と取得を1回のgetattrで済ませる
+            address_data = getattr(result, 'address', None) if result else None
+            if address_data is not None:
+                components = self._components(address_data)
+                prefecture, city, town, rest = components
                 
-                # 住所情報が含まれているかチェック
-                if self._has_valid_address_components(address_data):
-                    # 建物詳細抽出時間の計測
-                    building_start = time.perf_counter()
-                    building_info = self._extract_building_details(address_data.get('rest', ''))
-                    building_end = time.perf_counter()
-                    timing['building_extraction_ms'] = (building_end - building_start) * 1000
-                    
-                    # 信頼度計算時間の計測
-                    confidence_start = time.perf_counter()
-                    confidence = self._calculate_toriyama_confidence(address_data, building_info)
-                    confidence_end = time.perf_counter()
-                    timing['confidence_calc_ms'] = (confidence_end - confidence_start) * 1000
-                    
-                    # 完全な住所文字列を構築
-                    full_address = self._build_full_address(address_data)
+                # 最低限、都道府県または市区町村が必要
+                if prefecture or city:
+                    if now:
+                        # 建物詳細抽出・信頼度算出の時間の計測
+                        building_start = now()
+                        building_info = self._extract_building_details(rest)
+                        confidence_start = now()
+                        confidence, full_address, is_complete = self._analyze_address(components, building_info)
+                        confidence_end = now()
+                        timing['building_extraction_ms'] = (confidence_start - building_start) * 1000
+                        timing['confidence_calc_ms'] = (confidence_end - confidence_start) * 1000
+                    else:
+                        building_info = self._extract_building_details(rest)
+                        confidence, full_address, is_complete = self._analyze_address(components, building_info)
                     
                     address_info = {
                         'type': 'toriyama_parsed',
                         'address': full_address,
-                        'prefecture': address_data.get('prefecture', ''),
-                        'city': address_data.get('city', ''),
-                        'town': address_data.get('town', ''),
-                        'rest': address_data.get('rest', ''),
+                        'prefecture': prefecture,
+                        'city': city,
+                        'town': town,
+                        'rest': rest,
                         'building_name': building_info['building_name'],
                         'room_number': building_info['room_number'],
                         'floor': building_info['floor'],
                         'block_number': building_info['block_number'],
                         'confidence': confidence,
-                        'is_complete': self._is_address_complete(address_data, building_info),
+                        'is_complete': is_complete,
                         'raw_result': address_data,
                         'source_text': text,
                         'processing_time': timing
@@ -116,20 +405,21 @@ class ToriyamaAddressParser:
                     
                     addresses.append(address_info)
             
-            # 部分的な住所候補も検出
-            partial_addresses = self._detect_partial_addresses(text)
-            # 部分的住所にも時間情報を追加
-            for partial in partial_addresses:
-                partial['processing_time'] = timing.copy()
-            addresses.extend(partial_addresses)
+            # 部分的な住所候補も検出（中間リストを作らず結果に直接追加）
+            partial_start = len(addresses)
+            self._detect_partial_addresses(text, addresses)
+            # 部分的住所にも時間情報を追加（同じ解析の計測値なので1つのdictを共有）
+            for i in range(partial_start, len(addresses)):
+                addresses[i]['processing_time'] = timing
             
         except Exception as e:
             print(f"Error in Toriyama parser: {e}")
             # エラー時はフォールバックパーサーを使用
             addresses = self._extract_with_fallback_parser(text)
             # フォールバック使用時の時間情報を追加
+            timing = {'parser_ms': 0, 'building_extraction_ms': 0, 'confidence_calc_ms': 0}
             for addr in addresses:
-                addr['processing_time'] = {'parser_ms': 0, 'building_extraction_ms': 0, 'confidence_calc_ms': 0}
+                addr['processing_time'] = timing
         
         return addresses
     
@@ -137,70 +427,53 @@ class ToriyamaAddressParser:
         """フォールバック用の簡易住所抽出"""
         addresses = []
         
-        # 都道府県リスト
-        prefectures = [
-            "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県",
-            "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県", "東京都", "神奈川県",
-            "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県",
-            "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県",
-            "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県",
-            "徳島県", "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県",
-            "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県"
-        ]
+        # 都道府県名と市区町村の両方が無ければ一致し得ない
+        if _PREFECTURE_SUFFIX_CHARS.isdisjoint(text) or _CITY_SUFFIX_CHARS.isdisjoint(text):
+            return addresses
         
         # 都道府県から始まる住所パターンを検索
-        prefecture_pattern = "|".join(prefectures)
-        address_pattern = f'({prefecture_pattern})[^。、]*?(?:市|区|町|村)[^。、]*?(?:\\d+[丁目町][^。、]*?)?'
-        
-        matches = re.finditer(address_pattern, text)
-        for match in matches:
-            address_text = match.group(0)
-            prefecture = match.group(1)
-            
+        for address_text, prefecture in _iter_address_matches(text):
             confidence = self._calculate_fallback_confidence(address_text)
             
             if confidence >= 0.3:
-                address_info = {
-                    'type': 'fallback_parsed',
-                    'address': address_text,
-                    'prefecture': prefecture,
-                    'city': '',
-                    'town': '',
-                    'rest': '',
-                    'building_name': '',
-                    'room_number': '',
-                    'floor': '',
-                    'block_number': '',
-                    'confidence': confidence,
-                    'is_complete': False,
-                    'source_text': text
-                }
+                address_info = _EMPTY_ADDRESS_INFO.copy()
+                address_info['type'] = 'fallback_parsed'
+                address_info['address'] = address_text
+                address_info['prefecture'] = prefecture
+                address_info['confidence'] = confidence
+                address_info['source_text'] = text
                 
                 addresses.append(address_info)
         
         return addresses
     
-    def _has_valid_address_components(self, address_data) -> bool:
-        """住所データが有効な成分を含んでいるかチェック"""
+    def _components(self, address_data) -> Tuple[str, str, str, str]:
+        """住所データから (都道府県, 市区町村, 町域, 残り) を一度だけ取り出す"""
         if not address_data:
-            return False
-        
-        prefecture = address_data.get('prefecture', '') if isinstance(address_data, dict) else getattr(address_data, 'prefecture', '')
-        city = address_data.get('city', '') if isinstance(address_data, dict) else getattr(address_data, 'city', '')
-        
-        # 最低限、都道府県または市区町村が必要
-        return bool(prefecture or city)
+            return ('', '', '', '')
+        if isinstance(address_data, dict):
+            get = address_data.get
+            prefecture, city, town, rest = get('prefecture'), get('city'), get('town'), get('rest')
+        else:
+            prefecture = getattr(address_data, 'prefecture', '')
+            city = getattr(address_data, 'city', '')
+            town = getattr(address_data, 'town', '')
+            rest = getattr(address_data, 'rest', '')
+        # 繰り返し現れる都道府県・市区町村名は共有文字列にする
+        return (
+            sys.intern(prefecture) if prefecture else '',
+            sys.intern(city) if city else '',
+            town or '',
+            rest or '',
+        )
     
-    def _calculate_toriyama_confidence(self, address_data, building_info=None) -> float:
-        """Toriyamaパーサー結果の信頼度を計算"""
-        confidence = 0.0
-        
-        prefecture = address_data.get('prefecture', '') if isinstance(address_data, dict) else getattr(address_data, 'prefecture', '')
-        city = address_data.get('city', '') if isinstance(address_data, dict) else getattr(address_data, 'city', '')
-        town = address_data.get('town', '') if isinstance(address_data, dict) else getattr(address_data, 'town', '')
-        rest = address_data.get('rest', '') if isinstance(address_data, dict) else getattr(address_data, 'rest', '')
+    def _analyze_address(self, components: Tuple[str, str, str, str], building_info: Dict) -> Tuple[float, str, bool]:
+        """住所成分と建物情報から (信頼度, 完全な住所文字列, 完全かどうか) をまとめて算出"""
+        prefecture, city, town, rest = components
+        has_building = bool(building_info['building_name'] or building_info['room_number'])
         
         # 各成分の存在で信頼度を加算
+        confidence = 0.0
         if prefecture:
             confidence += 0.25
         if city:
@@ -211,17 +484,22 @@ class ToriyamaAddressParser:
             confidence += 0.15
         
         # 建物情報の詳細度でボーナス
-        if building_info:
-            if building_info.get('building_name'):
-                confidence += 0.05
-            if building_info.get('room_number'):
-                confidence += 0.05
-            if building_info.get('floor'):
-                confidence += 0.03
-            if building_info.get('block_number'):
-                confidence += 0.02
-        
-        return min(confidence, 1.0)
+        if building_info['building_name']:
+            confidence += 0.05
+        if building_info['room_number']:
+            confidence += 0.05
+        if building_info['floor']:
+            confidence += 0.03
+        if building_info['block_number']:
+            confidence += 0.02
+        
+        # 基本的な住所情報が存在するか（建物情報がある場合はrestに番地などが含まれていることを期待）
+        is_complete = bool(prefecture and city and (town or rest))
+        if has_building:
+            is_complete = is_complete and bool(rest)
+        
+        # 空の成分は空文字なのでそのまま連結できる
+        return min(confidence, 1.0), ''.join(components), is_complete
     
     def _calculate_fallback_confidence(self, address_text: str) -> float:
         """フォールバック住所の信頼度を計算"""
@@ -232,241 +510,104 @@ class ToriyamaAddressParser:
             confidence += 0.2
         
         # 数字が含まれている
-        if re.search(r'\d+', address_text):
+        if _HAS_DIGIT_RE.search(address_text):
             confidence += 0.2
         
         # 丁目・番地が含まれている
-        if re.search(r'\d+[丁目町]', address_text):
+        if _CHOME_RE.search(address_text):
             confidence += 0.3
         
         # 市区町村が含まれている
-        if re.search(r'(?:市|区|町|村)', address_text):
+        if _CITY_RE.search(address_text):
             confidence += 0.3
         
         return min(confidence, 1.0)
     
-    def _build_full_address(self, address_data) -> str:
-        """住所データから完全な住所文字列を構築"""
-        components = []
-        
-        prefecture = address_data.get('prefecture', '') if isinstance(address_data, dict) else getattr(address_data, 'prefecture', '')
-        city = address_data.get('city', '') if isinstance(address_data, dict) else getattr(address_data, 'city', '')
-        town = address_data.get('town', '') if isinstance(address_data, dict) else getattr(address_data, 'town', '')
-        rest = address_data.get('rest', '') if isinstance(address_data, dict) else getattr(address_data, 'rest', '')
-        
-        if prefecture:
-            components.append(prefecture)
-        if city:
-            components.append(city)
-        if town:
-            components.append(town)
-        if rest:
-            components.append(rest)
-        
-        return ''.join(components)
-    
-    def _is_address_complete(self, address_data, building_info=None) -> bool:
-        """住所が完全かどうかを判定"""
-        prefecture = address_data.get('prefecture', '') if isinstance(address_data, dict) else getattr(address_data, 'prefecture', '')
-        city = address_data.get('city', '') if isinstance(address_data, dict) else getattr(address_data, 'city', '')
-        town = address_data.get('town', '') if isinstance(address_data, dict) else getattr(address_data, 'town', '')
-        rest = address_data.get('rest', '') if isinstance(address_data, dict) else getattr(address_data, 'rest', '')
+    def _detect_partial_addresses(self, text: str, partial_addresses: Optional[List[Dict]] = None) -> List[Dict]:
+        """部分的な住所候補を検出（partial_addresses を渡すとそこへ追加する）"""
+        if partial_addresses is None:
+            partial_addresses = []
         
-        # 基本的な住所情報が存在するかチェック
-        basic_complete = bool(prefecture and city and (town or rest))
-        
-        # 建物情報がある場合はさらに詳細な住所とみなす
-        if building_info and (building_info.get('building_name') or building_info.get('room_number')):
-            return basic_complete and bool(rest)  # restに番地などが含まれていることを期待
-        
-        return basic_complete
-    
-    def _detect_partial_addresses(self, text: str) -> List[Dict]:
-        """部分的な住所候補を検出"""
-        partial_addresses = []
+        # 数字が1つも無ければ郵便番号はあり得ない（大半の発話はここで終わる）
+        if _DIGIT_CHARS.isdisjoint(text):
+            return partial_addresses
         
         # 郵便番号パターン
-        postal_pattern = r'(?:〒\s*)?(\d{3}[-−ー]?\d{4})'
-        postal_matches = re.finditer(postal_pattern, text)
-        
-        for match in postal_matches:
+        for match in _POSTAL_RE.finditer(text):
             postal_code = match.group(1)
-            clean_postal = re.sub(r'[-−ー]', '-', postal_code)
+            clean_postal = postal_code.translate(_HYPHEN_TABLE)
             
             if len(clean_postal.replace('-', '')) == 7:
-                address_info = {
-                    'type': 'postal_code_detected',
-                    'address': f'〒{clean_postal}',
-                    'prefecture': '',
-                    'city': '',
-                    'town': '',
-                    'rest': '',
-                    'building_name': '',
-                    'room_number': '',
-                    'floor': '',
-                    'block_number': '',
-                    'postal_code': clean_postal,
-                    'confidence': 0.8,
-                    'is_complete': False,
-                    'source_text': text
-                }
+                address_info = _EMPTY_ADDRESS_INFO.copy()
+                address_info['type'] = 'postal_code_detected'
+                address_info['address'] = f'〒{clean_postal}'
+                address_info['postal_code'] = clean_postal
+                address_info['confidence'] = 0.8
+                address_info['source_text'] = text
                 partial_addresses.append(address_info)
         
         return partial_addresses
     
     def _extract_building_details(self, rest_text: str) -> Dict[str, str]:
         """建物名、部屋番号、階数、番地を詳細に抽出"""
-        building_info = {
-            'building_name': '',
-            'room_number': '',
-            'floor': '',
-            'block_number': ''
+        building_name, room_number, floor, block_number = _building_details(rest_text)
+        return {
+            'building_name': building_name,
+            'room_number': room_number,
+            'floor': floor,
+            'block_number': block_number
         }
-        
-        if not rest_text:
-            return building_info
-        
-        # 番地パターンの抽出（例: 1-2-3, 10番地5号）
-        block_patterns = [
-            r'(\d+[-−ー]\d+[-−ー]\d+)',  # 1-2-3形式
-            r'(\d+[-−ー]\d+)',           # 1-2形式
-            r'(\d+番地\d+号)',           # 10番地5号形式
-            r'(\d+番\d+号)',            # 10番5号形式
-        ]
-        
-        for pattern in block_patterns:
-            match = re.search(pattern, rest_text)
-            if match:
-                building_info['block_number'] = match.group(1)
-                break
-        
-        # 建物名パターンの抽出
-        building_patterns = [
-            r'([^\d]+(?:マンション|ハイツ|コーポ|アパート|ビル|タワー|レジデンス|プラザ|ヒルズ|パーク|ガーデン|テラス|ホームズ|ヴィラ))',
-            r'([^\d]+(?:荘|寮|社宅|官舎))',
-            r'([A-Za-z\s]+(?:マンション|ハイツ|コーポ|アパート|ビル|タワー|レジデンス))',
-        ]
-        
-        for pattern in building_patterns:
-            match = re.search(pattern, rest_text)
-            if match:
-                building_info['building_name'] = match.group(1).strip()
-                break
-        
-        # 部屋番号パターンの抽出
-        room_patterns = [
-            r'(\d+号室)',              # 101号室
-            r'(\d+号)',                # 101号
-            r'(\d+F[-−ー]\d+)',        # 3F-205
-            r'(\d+階\d+号)',           # 3階205号
-            r'([A-Z]\d+)',             # A101
-            r'(\d+[A-Z])',             # 101A
-            r'(\d+-[A-Z])',            # 2-A
-        ]
-        
-        for pattern in room_patterns:
-            match = re.search(pattern, rest_text)
-            if match:
-                building_info['room_number'] = match.group(1)
-                break
-        
-        # 階数パターンの抽出
-        floor_patterns = [
-            r'(\d+階)',                # 5階
-            r'(\d+F)',                 # 5F
-            r'B(\d+)',                 # B1（地下）
-        ]
-        
-        for pattern in floor_patterns:
-            match = re.search(pattern, rest_text)
-            if match:
-                if pattern == r'B(\d+)':
-                    building_info['floor'] = f"B{match.group(1)}"
-                else:
-                    building_info['floor'] = match.group(1)
-                break
-        
-        return building_info
     
     def _evaluate_performance(self, time_ms: float) -> str:
         """処理時間に基づくパフォーマンス評価（500ms基準）"""
-        if time_ms < 100:
-            return "超高速"
-        elif time_ms < 500:
-            return "高速"
-        elif time_ms < 1000:
-            return "標準"
-        else:
-            return "低速"
+        return _PERF_LEVELS[bisect.bisect_right(_PERF_THRESHOLDS, time_ms)]
     
     def _get_performance_color(self, performance_level: str) -> str:
         """パフォーマンスレベルに対応する色を取得"""
-        color_map = {
-            "超高速": "🟢",
-            "高速": "🔵", 
-            "標準": "🟠",
-            "低速": "🔴"
-        }
-        return color_map.get(performance_level, "⚪")
+        return _PERF_COLORS.get(performance_level, "⚪")
     
     def get_best_address(self, addresses: List[Dict]) -> Optional[Dict]:
         """最適な住所を選択"""
         if not addresses:
             return None
-        
-        # 信頼度とタイプで並び替え
-        def sort_key(addr):
-            type_priority = {
-                'toriyama_parsed': 3,
-                'fallback_parsed': 2,
-                'postal_code_detected': 1
-            }
-            
-            completeness_bonus = 0.1 if addr.get('is_complete', False) else 0
-            
-            return (
-                type_priority.get(addr['type'], 0),
-                addr['confidence'] + completeness_bonus,
-                len(addr['address'])
-            )
-        
-        sorted_addresses = sorted(addresses, key=sort_key, reverse=True)
-        return sorted_addresses[0]
+        if len(addresses) == 1:
+            return addresses[0]  # ストリーミングでは候補1件が大半なのでキー計算を省く
+        
+        # タイプ・信頼度・長さのキーを1件につき1回だけ計算し、最大のものを選ぶ
+        keyed = [
+            ((_TYPE_PRIORITY.get(addr['type'], 0),
+              addr['confidence'] + (0.1 if addr.get('is_complete', False) else 0),
+              len(addr['address'])), addr)
+            for addr in addresses
+        ]
+        return max(keyed, key=_KEY)[1]
     
     def is_realtime_address_valid(self, text: str) -> bool:
         """リアルタイムテキストに有効な住所が含まれているかチェック"""
-        if not text.strip():
+        if not text or _ADDRESS_HINT_CHARS.isdisjoint(text):
             return False
         
-        addresses = self.extract_addresses_from_realtime_text(text)
-        return len(addresses) > 0 and any(addr['confidence'] >= 0.5 for addr in addresses)
+        # 抽出結果はテキスト単位でキャッシュされるので、続けて住所を取得しても再解析されない
+        return any(addr['confidence'] >= 0.5 for addr in self.extract_addresses_from_realtime_text(text))
     
     def format_address_for_display(self, address_info: Dict) -> str:
         """表示用に住所をフォーマット（パフォーマンス情報付き）"""
         if not address_info:
             return ""
         
-        parts = []
-        
-        if address_info.get('postal_code'):
-            parts.append(f"〒{address_info['postal_code']}")
-        
-        if address_info.get('address'):
-            parts.append(address_info['address'])
-        
-        # 建物情報を追加表示
-        building_parts = []
-        if address_info.get('building_name'):
-            building_parts.append(address_info['building_name'])
-        if address_info.get('floor'):
-            building_parts.append(f"{address_info['floor']}階" if not address_info['floor'].endswith(('階', 'F')) else address_info['floor'])
-        if address_info.get('room_number'):
-            building_parts.append(address_info['room_number'])
-        
-        if building_parts:
-            parts.append(' '.join(building_parts))
-        
-        return ' '.join(parts)
+        postal_code = address_info.get('postal_code')
+        floor = address_info.get('floor')
+        if floor and not floor.endswith(('階', 'F')):
+            floor = f"{floor}階"
+        
+        # 郵便番号・住所・建物情報のうち空でないものを空白区切りで連結
+        return ' '.join(filter(None, (
+            f"〒{postal_code}" if postal_code else '',
+            address_info.get('address'),
+            address_info.get('building_name'),
+            floor,
+            address_info.get('room_number'),
+        )))
     
     def format_performance_info(self, address_info: Dict) -> str:
         """パフォーマンス情報をフォーマット"""
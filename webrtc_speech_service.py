@@ -1,7 +1,9 @@
 import os
 import json
+import concurrent.futures
+import functools
+import math
 import time
-import queue
 import threading
 import numpy as np
 import streamlit as st
@@ -11,60 +13,241 @@ import tempfile
 import atexit
 from streamlit_webrtc import webrtc_streamer, WebRtcMode, RTCConfiguration
 import av
+import logging
+from logging_utils import RateLimitingFilter
+try:
+    from numba import njit
+except ImportError:
+    # 未導入時はNumPyで音量を計算する
+    njit = None
+
+
+def _frame_rms_numpy(samples: np.ndarray) -> float:
+    """int16サンプルのRMS（0-1に正規化）"""
+    # 二乗和をint16のまま1回で集計する（int64で累積するので桁あふれせず、配列のコピーも作らない）
+    square_sum = int(np.einsum('i,i->', samples, samples, dtype=np.int64))
+    return math.sqrt(square_sum / samples.size) / 32768.0
+
+if njit is not None:
+    @njit(cache=True)
+    def _frame_rms(samples):
+        """int16サンプルのRMS（0-1に正規化、1ループで二乗和を集計）"""
+        square_sum = 0
+        for i in range(samples.size):
+            v = np.int64(samples[i])
+            square_sum += v * v
+        return (square_sum / samples.size) ** 0.5 / 32768.0
+    
+    # 最初の音声フレームでコンパイル待ちが起きないよう読み込み時にコンパイルしておく
+    _frame_rms(np.zeros(1, dtype=np.int16))
+else:
+    _frame_rms = _frame_rms_numpy
+
+
+# 音声フレーム（20msごと）や認識応答ごとのログが出力で詰まらないよう、同じ内容は1秒に1回に抑える
+logger = logging.getLogger(__name__)
+logger.addFilter(RateLimitingFilter())
+
+# 暖機は初回描画を待たせないよう共有のバックグラウンドスレッドで行う
+_WARM_UP_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="webrtc-warm-up")
+# 暖機用の無音（16kHz・16bitで100ms分）は毎回作らず使い回す
+_WARM_UP_SILENCE = bytes(3200)
+
+# 一時認証ファイル（同じ認証情報ならサービス生成のたびに書き直さず使い回す）
+_credentials_lock = threading.Lock()
+_credentials_json = None
+_credentials_path = None
+
+
+def _cleanup_temp_credentials_file(file_path: str):
+    """一時認証ファイルをクリーンアップ"""
+    try:
+        if os.path.exists(file_path):
+            os.unlink(file_path)
+    except Exception as e:
+        logger.warning("一時認証ファイルの削除に失敗: %s", e)
+
+
+def _cleanup_current_credentials_file():
+    """終了時に現在の一時認証ファイルを削除（プロセスで1回だけ登録する）"""
+    if _credentials_path:
+        _cleanup_temp_credentials_file(_credentials_path)
+
+
+# SpeechClientはスレッドセーフなので認証情報ごとに1つを全インスタンスで共有する
+_speech_clients = {}
+_speech_clients_lock = threading.Lock()
+_warmed_up_clients = set()  # 暖機済み（または暖機中）のクライアントのid
+
+
+@functools.lru_cache(maxsize=None)
+def _recognition_configs(sample_rate: int):
+    """認識設定（通常用・ストリーミング用・暖機用）をサンプルレートごとに1回だけ作成"""
+    recognition_config = speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=sample_rate,
+        language_code="ja-JP",
+        enable_automatic_punctuation=True,
+        model="latest_short",
+    )
+    streaming_config = speech.StreamingRecognitionConfig(
+        config=recognition_config,
+        single_utterance=False,
+        interim_results=True,
+        # max_duration={"seconds": 300},  # 最大5分間の連続認識
+        # 音声検出タイムアウトの設定
+    )
+    warm_up_streaming_config = speech.StreamingRecognitionConfig(config=recognition_config, single_utterance=True)
+    return recognition_config, streaming_config, warm_up_streaming_config
+
+
+def _get_speech_client() -> speech.SpeechClient:
+    """現在の認証情報に対応する共有SpeechClientを取得（無ければ作成）"""
+    key = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    with _speech_clients_lock:
+        client = _speech_clients.get(key)
+        if client is None:
+            client = _speech_clients[key] = speech.SpeechClient()
+        return client
+
+
+def _claim_speech_client_warm_up(client: speech.SpeechClient) -> bool:
+    """共有クライアントの暖機を1回だけ行うため、初回の呼び出しにだけTrueを返す"""
+    with _speech_clients_lock:
+        if id(client) in _warmed_up_clients:
+            return False
+        _warmed_up_clients.add(id(client))
+        return True
+
 
 class WebRTCAudioProcessor:
     """WebRTC音声データを処理するクラス"""
     
-    def __init__(self, sample_rate=16000, channels=1):
-        self.audio_queue = queue.Queue()
+    def __init__(self, sample_rate=16000, channels=1, buffer_seconds=30):
         self.is_recording = False
+        self.sample_rate = sample_rate
         self.resampler = av.AudioResampler(format='s16', layout='mono', rate=sample_rate)
+        self._needs_resample = None  # 録音開始後の最初のフレームで判定（ブラウザの音声形式は録音中は変わらない）
         self.latest_volume = 0.0  # 追加: 最新ボリューム値
+        self.volume_interval = 0.05  # 音量の更新間隔（秒）。表示用なので20Hzで十分
+        self._volume_last_ts = 0.0
+        
+        # 受信音声のリングバッファ（int16サンプル単位で事前確保し、フレームごとのbytes生成を避ける）
+        # 書き込みはWebRTCのコールバック、読み出しは認識スレッドの1対1
+        self._ring = np.zeros(sample_rate * channels * buffer_seconds, dtype=np.int16)
+        self._write_pos = 0  # これまでに書き込んだ総サンプル数
+        self._read_pos = 0   # これまでに読み出した総サンプル数
+        self._data_ready = threading.Event()
+        # 認識リクエスト1件あたりの最小音声長（100ms）。20msフレームごとの送信をまとめる
+        self.min_chunk_samples = sample_rate * channels // 10
+        # 上限（500ms）。読み出しが遅れて溜まっても1リクエストの音声サイズ制限（25KB）を超えないように分割する
+        self.max_chunk_samples = sample_rate * channels // 2
         
     def recv(self, frame: av.AudioFrame) -> av.AudioFrame:
         """WebRTCから音声フレームを受信"""
-        if self.is_recording:
-            try:
+        # 録音していなければ何もしない（SENDONLYなので戻り値のフレームは使われない）
+        if not self.is_recording:
+            return frame
+        
+        try:
+            # 既に目的の形式（16bitモノラル・同じレート）ならリサンプリングを省く
+            needs_resample = self._needs_resample
+            if needs_resample is None:
+                needs_resample = self._needs_resample = not (
+                    frame.sample_rate == self.sample_rate and frame.format.name == 's16'
+                    and frame.layout.name == 'mono')
+            if not needs_resample:
+                resampled_frames = (frame,)
+            else:
                 # 音声フレームをリサンプリング
                 resampled_frames = self.resampler.resample(frame)
-                for resampled_frame in resampled_frames:
-                    audio_data = resampled_frame.to_ndarray()
-                    self.audio_queue.put(audio_data.tobytes())
-                    
-                    # ボリューム計算（16-bit音声データ用に正規化）
-                    if audio_data.size > 0:
-                        # 16-bit音声データを正規化してRMS計算
-                        normalized_audio = audio_data.astype(np.float32) / 32768.0
-                        rms = np.sqrt(np.mean(np.square(normalized_audio)))
-                        # 音量を0-1の範囲にスケール
-                        self.latest_volume = float(min(rms * 10, 1.0))
-            except Exception as e:
-                print(f"WebRTC音声フレーム処理エラー: {e}")
-                print(f"Received audio frame (size: {len(resampled_frame.to_ndarray().tobytes())} bytes)")
-                
+            samples = None
+            for resampled_frame in resampled_frames:
+                # フレームのバッファをコピーせずint16として参照する（16bitモノラルなので1面のみ）
+                # リングバッファへの書き込みが唯一のコピーになり、連結用の中間配列も作らない
+                samples = np.frombuffer(resampled_frame.planes[0], dtype=np.int16, count=resampled_frame.samples)
+                self._write_samples(samples)
+            if samples is None:
+                return frame
+            # リサンプラーが複数フレームに分けて返しても、ジェネレータへの通知は受信1回につき1回
+            self._data_ready.set()
+            
+            # ボリューム計算（16-bit音声データ用に正規化、更新間隔ごとに1回だけ、直近のフレームで計算）
+            if samples.size > 0:
+                now = time.monotonic()
+                if now - self._volume_last_ts >= self.volume_interval:
+                    self._volume_last_ts = now
+                    # 音量を0-1の範囲にスケール（RMSはPythonのfloatなので比較1回で上限を切る）
+                    volume = _frame_rms(samples) * 10.0
+                    self.latest_volume = 1.0 if volume > 1.0 else volume
+        except Exception as e:
+            logger.warning("WebRTC音声フレーム処理エラー: %s", e)
+        
         return frame
     
+    def _write_samples(self, samples: np.ndarray):
+        """リングバッファにサンプルを書き込む（末尾を越えたら先頭に折り返す、通知は呼び出し側で行う）"""
+        size = self._ring.size
+        n = samples.size
+        if n > size:
+            samples = samples[-size:]
+            n = size
+        start = self._write_pos % size
+        first = min(n, size - start)
+        self._ring[start:start + first] = samples[:first]
+        if first < n:
+            self._ring[:n - first] = samples[first:]
+        self._write_pos += n
+    
+    def _read_pending(self) -> bytes:
+        """未読のサンプルをまとめてbytesで取り出す（最大 max_chunk_samples 分）"""
+        # リングバッファ自体が100ms単位にまとめるための作業領域を兼ねる
+        # 別の作業バッファに詰め直すとコピーが1回増えるので、ここから直接bytesを作る（1リクエスト1回のコピー）
+        size = self._ring.size
+        write_pos = self._write_pos
+        # 読み出しが追いつかず上書きされた古い音声は捨てる
+        read_pos = max(self._read_pos, write_pos - size)
+        if read_pos == write_pos:
+            return b''
+        write_pos = min(write_pos, read_pos + self.max_chunk_samples)
+        start = read_pos % size
+        end = start + (write_pos - read_pos)
+        if end <= size:
+            chunk = self._ring[start:end].tobytes()
+        else:
+            # 折り返し部分も中間のbytesを作らず1回のコピーで連結する
+            chunk = b''.join((self._ring[start:], self._ring[:end - size]))
+        self._read_pos = write_pos
+        return chunk
+    
     def start_recording(self):
         """録音開始"""
+        # 前回の録音で読み残した音声を捨てる（読み出し位置を進めるだけで、1件ずつ取り出す必要はない）
+        self._read_pos = self._write_pos
+        self._data_ready.clear()  # 前回の停止時の通知で空振りしないように
+        self._needs_resample = None
         self.is_recording = True
-        # キューをクリア
-        while not self.audio_queue.empty():
-            try:
-                self.audio_queue.get_nowait()
-            except queue.Empty:
-                break
     
     def stop_recording(self):
         """録音停止"""
         self.is_recording = False
+        self.wake_generator()  # 待機中のジェネレータをすぐ終了させる
 
-    def audio_generator(self):
-        """音声データをジェネレータとして供給"""
-        while self.is_recording:
-            try:
-                yield self.audio_queue.get(timeout=0.1)
-            except queue.Empty:
+    def wake_generator(self):
+        """待機中のジェネレータを起こす（停止の通知を待たずに確認させる）"""
+        self._data_ready.set()
+
+    def audio_generator(self, stop_event: threading.Event = None):
+        """音声データをジェネレータとして供給（stop_event がセットされたら終了）"""
+        while self.is_recording and not (stop_event and stop_event.is_set()):
+            if self._write_pos - self._read_pos < self.min_chunk_samples:
+                # 受信・停止の通知で起きる（タイムアウトは通知漏れ対策の保険）
+                self._data_ready.wait(timeout=1.0)
+                self._data_ready.clear()
                 continue
+            chunk = self._read_pending()
+            if chunk:
+                yield chunk
 
 
 class WebRTCSpeechService:
@@ -80,9 +263,12 @@ class WebRTCSpeechService:
         
         self.sample_rate = 16000
         self.channels = 1
-        self.client = speech.SpeechClient()
+        self.client = _get_speech_client()
         self.audio_processor = WebRTCAudioProcessor(self.sample_rate, self.channels)
         
+        # 認識設定は再接続ごとにもインスタンスごとにも作り直さず使い回す
+        self.recognition_config, self.streaming_config, self._warm_up_streaming_config = _recognition_configs(self.sample_rate)
+        
         self.recognition_thread = None
         self.is_streaming = False
         self.streaming_start_time = None
@@ -92,24 +278,45 @@ class WebRTCSpeechService:
         self.address_parser = None
         
         # スレッド安全な共有データ管理
+        # 書き込み側は _data_lock 内で新しいdictを作って差し替え、読み出し側はロックなしで参照する
         self._data_lock = threading.Lock()
+        self._parse_generation = 0  # クリアごとに進める番号（クリア前に依頼した抽出結果を捨てるため）
+        self._final_chunks = []  # 確定テキストの断片（全件を保持、住所抽出は末尾の数件だけを対象にする）
+        self.parse_window_chunks = 3  # 断片の境界をまたぐ住所も拾えるよう直近3件をまとめて解析
+        self._last_parse_text = None  # 直前に抽出を依頼したテキスト（同じなら再解析しない）
+        self._parsed_chunk_count = 0  # 抽出を依頼済みの断片数
+        self._parse_in_flight = False  # 抽出を実行中か（実行中に届いた確定結果は完了後にまとめて解析）
+        self._parse_pending = False
+        # 途中結果は最も頻繁に変わるので共有データとは別の参照にし、ロックも辞書のコピーもなしで差し替える
+        # （書き込むのは認識スレッドとクリアだけで、参照の代入はGILの下で不可分）
+        self._interim_text = ''
+        self._last_session_data = None  # 直近に返したデータと、その元になった参照
         self._shared_data = {
             'all_final_text': '',
-            'interim_text': '',
             'extracted_addresses': [],
             'best_address': None,
             'error_message': '',
             'performance_stats': {'total_extractions': 0, 'fast_extractions': 0, 'total_time_ms': 0, 'min_time_ms': float('inf'), 'max_time_ms': 0, 'avg_time_ms': 0} if "performance_stats" in key_prefix else None
         }
         
-        if auto_warm_up:
-            self.warm_up_services()
+        # 共有クライアントの接続は一度暖めれば十分なので、インスタンスごとには暖機しない
+        if auto_warm_up and _claim_speech_client_warm_up(self.client):
+            self._warm_up_future = _WARM_UP_EXECUTOR.submit(self.warm_up_services)
+        else:
+            self._warm_up_future = None
 
     def _setup_google_credentials(self):
         """Google Cloud認証を設定（環境変数またはJSONファイル）"""
+        global _credentials_json, _credentials_path
         try:
             credentials_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-            if credentials_json:
+            if not credentials_json:
+                return
+            with _credentials_lock:
+                if credentials_json == _credentials_json and os.path.exists(_credentials_path):
+                    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = _credentials_path
+                    return
+                
                 try:
                     json.loads(credentials_json)
                 except json.JSONDecodeError as e:
@@ -121,7 +328,14 @@ class WebRTCSpeechService:
                     temp_file.flush()
                     temp_file.close()
                     os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = temp_file.name
-                    atexit.register(self._cleanup_temp_credentials_file, temp_file.name)
+                    # 古いファイルは差し替え時に消す
+                    # ファイルはインスタンス間で共有するので、インスタンスの破棄（weakref.finalize）では消さず、
+                    # 終了時に現在のファイルを消すハンドラをプロセスで1回だけ登録する
+                    if _credentials_path:
+                        _cleanup_temp_credentials_file(_credentials_path)
+                    else:
+                        atexit.register(_cleanup_current_credentials_file)
+                    _credentials_json, _credentials_path = credentials_json, temp_file.name
                 except Exception as e:
                     try: os.unlink(temp_file.name)
                     except: pass
@@ -129,14 +343,6 @@ class WebRTCSpeechService:
         except Exception as e:
             st.error(f"Google Cloud認証の設定に失敗しました: {e}")
 
-    def _cleanup_temp_credentials_file(self, file_path: str):
-        """一時認証ファイルをクリーンアップ"""
-        try:
-            if os.path.exists(file_path):
-                os.unlink(file_path)
-        except Exception as e:
-            print(f"一時認証ファイルの削除に失敗: {e}")
-    
     def set_address_parser(self, address_parser):
         """住所パーサーを設定"""
         self.address_parser = address_parser
@@ -176,93 +382,115 @@ class WebRTCSpeechService:
 
     def start_streaming_recognition(self):
         """音声認識を開始"""
-        print("WebRTC音声認識を開始...")
+        logger.info("WebRTC音声認識を開始...")
         self.clear_session_state()
         self.is_streaming = True
         self.streaming_start_time = time.time()
         self.audio_processor.start_recording()
-        self.recognition_thread = threading.Thread(target=self._run_recognition_thread)
+        # スレッド名はログの %(threadName)s に出るので、ログ行ごとにスレッドIDを取得しない
+        self.recognition_thread = threading.Thread(
+            target=self._run_recognition_thread,
+            name=f"{self.session_state_key_prefix}-stt"
+        )
         self.recognition_thread.start()
 
     def stop_streaming_recognition(self):
         """音声認識を停止"""
-        print("WebRTC音声認識を停止...")
+        logger.info("WebRTC音声認識を停止...")
         self.is_streaming = False
         self.audio_processor.stop_recording()
         if self.recognition_thread and self.recognition_thread.is_alive() and self.recognition_thread != threading.current_thread():
             self.recognition_thread.join(timeout=1.0)
     
     def _run_recognition_thread(self):
-        """WebRTC音声認識スレッド"""
+        """WebRTC音声認識スレッド（ストリームが切れても録音中は同じスレッドで再接続）"""
+        while self.is_streaming and self.audio_processor.is_recording:
+            try:
+                self._run_recognition_stream()
+            except Exception as e:
+                self._handle_recognition_error(f"認識エラー: {e}")
+                time.sleep(0.5)  # エラーが続く場合に再接続を連打しない
+            if self.is_streaming and self.audio_processor.is_recording:
+                logger.debug("Restarting recognition stream")
+    
+    def _run_recognition_stream(self):
+        """ストリーミング認識を1回分実行（確定結果・時間制限・ストリーム終了で戻る）"""
+        # このストリームを抜けたら音声の読み出しもやめる（次のストリームと取り合わないように）
+        stream_done = threading.Event()
+        requests_done = threading.Event()  # 音声の読み出しを実際にやめたことの通知
+        def requests():
+            try:
+                for chunk in self.audio_processor.audio_generator(stream_done):
+                    yield speech.StreamingRecognizeRequest(audio_content=chunk)
+            finally:
+                requests_done.set()
         try:
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=self.sample_rate,
-                language_code="ja-JP",
-                enable_automatic_punctuation=True,
-                model="latest_short",
-            )
-            streaming_config = speech.StreamingRecognitionConfig(
-                config=config,
-                single_utterance=False,
-                interim_results=True,
-                # max_duration={"seconds": 300},  # 最大5分間の連続認識
-                # 音声検出タイムアウトの設定
-            )
-            
-            requests = (
-                speech.StreamingRecognizeRequest(audio_content=chunk)
-                for chunk in self.audio_processor.audio_generator()
-            )
-            responses = self.client.streaming_recognize(streaming_config, requests)
-            should_restart = False
+            responses = self.client.streaming_recognize(self.streaming_config, requests())
+            # 時間制限はストリームごとにかかるので、開いた時刻から数える
+            self.streaming_start_time = time.time()
+            # 応答ごとの処理はGILを持ったまま走るので、1応答あたりのPython側の仕事を最小にする
+            # （応答待ちの間はgRPCがGILを解放している）
+            deadline = self.streaming_start_time + self.max_streaming_duration
             for response in responses:
-                print("=== [DEBUG] New response received ===")
-                print("response:", response)
-                print("response.results:", response.results)
-                print("response.speech_event_type:", getattr(response, "speech_event_type", None))
-                print("response.error:", getattr(response, "error", None))
-                print("response.is_final (any):", any([getattr(r, "is_final", None) for r in response.results]))
+                logger.debug("STT response received: %s", response)
                 ############# is_final=false → true 時の処理  
                 # if getattr(response, "speech_event_type", None) == 1:  # END_OF_SINGLE_UTTERANCE
                 #     print("[DEBUG] END_OF_SINGLE_UTTERANCE detected, restarting stream")
                 #     break
                 if not self.is_streaming: 
-                    print("response loop: self.is_streaming = ", self.is_streaming)
+                    logger.debug("Streaming stopped, leaving response loop")
                     break
-                if self._should_restart_streaming():
-                    self._handle_recognition_error("ストリーミング時間制限（305秒）に達しました。")
+                if time.time() >= deadline:
+                    self._hand_off_recognition_stream(responses, stream_done, requests_done)
                     break
                 
-                for result in response.results:
-                    print("  [DEBUG] result:", result)
-                    print("  [DEBUG] result.is_final:", getattr(result, "is_final", None))
-                    print("  [DEBUG] result.alternatives:", getattr(result, "alternatives", None))
-                    if result.alternatives:
-                        self._handle_recognition_result(result.alternatives[0].transcript, result.is_final)
-                        print(f"Processing recognition result: Transcript='{result.alternatives[0].transcript}', IsFinal={result.is_final}")
-                        if result.is_final:
-                            print("[DEBUG] is_final=True detected, will restart stream after handling result")
-                            should_restart = True
-                            break # break inner for-loop
-                if should_restart:
-                    break  # break outer for-loop    
-            print("[DEBUG] Google STT streaming responses loop exited (stream ended or closed)")            
-        except Exception as e:
-            self._handle_recognition_error(f"認識エラー: {e}")
-            print(f"[DEBUG] Exception in recognition thread: {e}")
+                if self._handle_streaming_response(response):
+                    logger.debug("Final result received, restarting stream")
+                    break
+            logger.debug("STT response loop exited (stream ended or closed)")
         finally:
-            # ストリームが切れても録音中なら再起動
-            if self.is_streaming and self.audio_processor.is_recording:
-                print("[DEBUG] Restarting recognition thread due to stream end")
-                self.recognition_thread = threading.Thread(target=self._run_recognition_thread)
-                self.recognition_thread.start()
-
-    def _should_restart_streaming(self) -> bool:
-        """ストリーミングを再開すべきかチェック"""
-        if not self.streaming_start_time: return False
-        return (time.time() - self.streaming_start_time) >= self.max_streaming_duration
-    
+            stream_done.set()
+
+    def _handle_streaming_response(self, response, interim=True) -> bool:
+        """1応答分の認識結果を反映し、確定結果があればTrueを返す"""
+        # 途中結果は最後のものだけが表示に残るので、共有データの更新は1応答につき1回にまとめる
+        interim_transcript = None
+        for result in response.results:
+            if result.alternatives:
+                if result.is_final:
+                    self._handle_recognition_result(result.alternatives[0].transcript, True)
+                    return True
+                interim_transcript = result.alternatives[0].transcript
+        if interim and interim_transcript is not None:
+            self._handle_recognition_result(interim_transcript, False)
+        return False
+
+    def _hand_off_recognition_stream(self, responses, stream_done: threading.Event, requests_done: threading.Event):
+        """時間制限の近いストリームを閉じ、残りの確定結果は別スレッドで受け取る（認識は次のストリームですぐ再開）"""
+        logger.debug("Streaming time limit reached, handing off to a new stream")
+        # 送信側だけを閉じると、送信済みの音声の確定結果が返ってからストリームが終わる
+        # 未送信の音声はリングバッファに残り、次のストリームがそこから読み出す
+        stream_done.set()
+        self.audio_processor.wake_generator()
+        requests_done.wait(timeout=1.0)
+        threading.Thread(
+            target=self._drain_recognition_responses,
+            args=(responses,),
+            name=f"{self.session_state_key_prefix}-stt-drain",
+            daemon=True,
+        ).start()
+
+    def _drain_recognition_responses(self, responses):
+        """閉じたストリームの残りの応答から確定結果だけを反映"""
+        try:
+            for response in responses:
+                if not self.is_streaming:
+                    break
+                # 途中結果は次のストリームの表示と取り合うので反映しない
+                self._handle_streaming_response(response, interim=False)
+        except Exception as e:
+            logger.debug("Draining closed recognition stream failed: %s", e)
+
     def _initialize_session_state(self):
         """セッション状態を初期化"""
         prefix = self.session_state_key_prefix
@@ -274,55 +502,128 @@ class WebRTCSpeechService:
         if "performance_stats" in prefix: # Only for fast mode
              st.session_state[f"{prefix}_performance_stats"] = {'total_extractions': 0, 'fast_extractions': 0, 'total_time_ms': 0, 'min_time_ms': float('inf'), 'max_time_ms': 0, 'avg_time_ms': 0}
 
+    def _publish_shared_data(self, **changes):
+        """共有データを変更後のコピーに差し替える（_data_lock を保持して呼ぶ）"""
+        snapshot = self._shared_data.copy()
+        snapshot.update(changes)
+        self._shared_data = snapshot
+    
     def _handle_recognition_result(self, transcript: str, is_final: bool):
         """音声認識結果を処理（スレッド安全）"""
-        print(f"[DEBUG] is_final={is_final}, self.is_streaming={self.is_streaming}, audio_processor.is_recording={self.audio_processor.is_recording}")
-        print(f"[Thread-{threading.get_ident()}] Handling recognition result: '{transcript}', is_final={is_final}")
+        if not is_final:
+            # 途中結果の内容は "STT response received" のログに出ているので、ここでは記録しない
+            self._interim_text = transcript
+            return
         
+        logger.debug("Final recognition result: %r", transcript)
         with self._data_lock:
-            if is_final:
-                self._shared_data['all_final_text'] += transcript
-                self._shared_data['interim_text'] = ""
-                print(f"[Thread-{threading.get_ident()}] Updated final text: '{self._shared_data['all_final_text']}'")
-                
-                # 住所抽出処理（必要な場合）
-                if self.address_parser:
-                    self._extract_addresses_from_shared_text(self._shared_data['all_final_text'])
-            else:
-                self._shared_data['interim_text'] = transcript
-                print(f"[Thread-{threading.get_ident()}] Updated interim text: '{transcript}'")
+            # 確定テキストは断片のリストに追記し（文字列の+=で全文を毎回コピーしない）、
+            # 表示用の全文は確定時に1回だけjoinしてスナップショットに持たせる（再描画はそれを読むだけ）
+            self._final_chunks.append(transcript)
+            # 確定文と途中結果が二重に見えないよう、途中結果を先に消す
+            self._interim_text = ''
+            self._publish_shared_data(all_final_text=''.join(self._final_chunks))
+            parse_text = None
+            # 空白だけの確定結果は解析対象を変えないので抽出を依頼しない
+            if transcript.strip():
+                if self._parse_in_flight:
+                    # 短い確定結果が続けて届いたときは、実行中の抽出が終わってから1回にまとめて解析する
+                    self._parse_pending = True
+                else:
+                    parse_text = self._take_parse_text()
+            parse_generation = self._parse_generation
+        
+        if parse_text:
+            self._submit_address_extraction(parse_text, parse_generation)
+    
+    def _take_parse_text(self):
+        """未解析の断片と、その直前の断片をつないだ解析対象を返す（_data_lock を保持して呼ぶ）"""
+        # 断片の境界をまたぐ住所も拾えるよう、未解析の断片の前に (parse_window_chunks - 1) 件を含める
+        chunk_count = len(self._final_chunks)
+        start = max(0, min(self._parsed_chunk_count, chunk_count - 1) - (self.parse_window_chunks - 1))
+        self._parsed_chunk_count = chunk_count
+        parse_text = ''.join(self._final_chunks[start:])
+        if parse_text == self._last_parse_text or not self.address_parser:
+            return None
+        self._last_parse_text = parse_text
+        self._parse_in_flight = True
+        return parse_text
     
-    def _extract_addresses_from_shared_text(self, text: str):
-        """テキストから住所を抽出して共有データに保存（スレッド安全）"""
+    def _submit_address_extraction(self, parse_text: str, parse_generation: int):
+        """住所抽出をパーサーのスレッドプールに依頼（_data_lock の外で呼ぶ）"""
+        # 認識スレッドとロックを塞がず、全文ではなく直近の断片だけを解析するので処理量が発話時間に比例しない
         try:
-            addresses = self.address_parser.extract_addresses_from_realtime_text(text)
-            self._shared_data['extracted_addresses'] = addresses
-            if addresses:
-                best_address = self.address_parser.get_best_address(addresses)
-                self._shared_data['best_address'] = best_address
-                if self._shared_data['performance_stats'] and 'processing_time' in best_address:
-                    self._update_shared_performance_stats(best_address['processing_time'])
+            future = self.address_parser.parse_async(parse_text)
         except Exception as e:
-            print(f"[Thread-{threading.get_ident()}] Address extraction error: {e}")
-            self._shared_data['error_message'] = f"住所抽出エラー: {e}"
+            logger.warning("Address extraction error: %s", e)
+            self._finish_address_extraction(parse_generation)
+            return
+        future.add_done_callback(lambda f: self._extract_addresses_from_shared_text(f, parse_generation))
+    
+    def _finish_address_extraction(self, parse_generation: int):
+        """抽出の完了を記録し、実行中に届いた確定結果があればまとめて次の抽出を依頼"""
+        with self._data_lock:
+            if parse_generation != self._parse_generation:
+                return  # クリア後は新しい世代の抽出が管理する
+            self._parse_in_flight = False
+            parse_text = None
+            if self._parse_pending:
+                self._parse_pending = False
+                parse_text = self._take_parse_text()
+        if parse_text:
+            self._submit_address_extraction(parse_text, parse_generation)
+    
+    def _extract_addresses_from_shared_text(self, future, parse_generation: int):
+        """住所抽出結果を共有データに保存（スレッド安全）"""
+        try:
+            self._store_extracted_addresses(future, parse_generation)
+        finally:
+            self._finish_address_extraction(parse_generation)
+    
+    def _store_extracted_addresses(self, future, parse_generation: int):
+        """抽出した住所を共有データにマージ"""
+        try:
+            addresses = future.result()
+            with self._data_lock:
+                if parse_generation != self._parse_generation:
+                    return  # 依頼後にクリアされた
+                # 既存の抽出結果に新しい住所だけを追加（住所文字列で重複排除）
+                merged = self._shared_data['extracted_addresses']
+                known = {addr['address'] for addr in merged}
+                new_addresses = [addr for addr in addresses if addr['address'] not in known]
+                if not new_addresses:
+                    return
+                merged = merged + new_addresses
+                changes = {
+                    'extracted_addresses': merged,
+                    'best_address': self.address_parser.get_best_address(merged)
+                }
+                latest = self.address_parser.get_best_address(new_addresses)
+                # キャッシュ由来の結果は過去の計測値なので統計に数えない
+                if self._shared_data['performance_stats'] and 'processing_time' in latest and not latest['processing_time'].get('cache_hit'):
+                    changes['performance_stats'] = self._updated_shared_performance_stats(latest['processing_time'])
+                self._publish_shared_data(**changes)
+        except Exception as e:
+            logger.warning("Address extraction error: %s", e)
+            with self._data_lock:
+                self._publish_shared_data(error_message=f"住所抽出エラー: {e}")
     
     def _extract_addresses_from_text(self, text: str):
         """テキストから住所を抽出してセッション状態に保存（レガシー）"""
         prefix = self.session_state_key_prefix
+        if f"{prefix}_extracted_addresses" not in st.session_state:
+            self._initialize_session_state()
         addresses = self.address_parser.extract_addresses_from_realtime_text(text)
         st.session_state[f"{prefix}_extracted_addresses"] = addresses
         if addresses:
             best_address = self.address_parser.get_best_address(addresses)
             st.session_state[f"{prefix}_best_address"] = best_address
-            if "performance_stats" in prefix and 'processing_time' in best_address:
+            if "performance_stats" in prefix and 'processing_time' in best_address and not best_address['processing_time'].get('cache_hit'):
                 self._update_performance_stats(best_address['processing_time'])
 
-    def _update_shared_performance_stats(self, timing: Dict[str, float]):
-        """パフォーマンス統計を更新（共有データ版）"""
-        if not self._shared_data['performance_stats']:
-            return
-            
-        stats = self._shared_data['performance_stats']
+    def _updated_shared_performance_stats(self, timing: Dict[str, float]) -> Dict[str, float]:
+        """更新後のパフォーマンス統計を返す（共有データ版、元のdictは変更しない）"""
+        stats = self._shared_data['performance_stats'].copy()
         total_time = timing.get('total_ms', 0)
         if total_time > 0:
             stats['total_extractions'] += 1
@@ -331,6 +632,7 @@ class WebRTCSpeechService:
             stats['min_time_ms'] = min(stats['min_time_ms'], total_time)
             stats['max_time_ms'] = max(stats['max_time_ms'], total_time)
             stats['avg_time_ms'] = stats['total_time_ms'] / stats['total_extractions']
+        return stats
 
     def _update_performance_stats(self, timing: Dict[str, float]):
         """パフォーマンス統計を更新（レガシー）"""
@@ -348,65 +650,66 @@ class WebRTCSpeechService:
 
     def _handle_recognition_error(self, error_msg: str):
         """音声認識エラーを処理（スレッド安全）"""
-        print(f"[Thread-{threading.get_ident()}] Recognition error: {error_msg}")
+        logger.warning("Recognition error: %s", error_msg)
         with self._data_lock:
-            self._shared_data['error_message'] = error_msg
+            self._publish_shared_data(error_message=error_msg)
     
     def get_session_state_data(self) -> Dict[str, Any]:
-        """セッション状態データを取得（共有データから同期）"""
-        print(f"[Main-Thread-{threading.get_ident()}] Getting session state data...")
-        
-        # 共有データからセッション状態に同期
-        with self._data_lock:
-            shared_copy = self._shared_data.copy()
+        """認識結果データを取得（共有データのスナップショットから作成、呼び出し側は変更しない）"""
+        # 差し替え式なので参照を取るだけでよい
+        # 呼び出し側は戻り値だけを使うので、st.session_state への毎回の書き写しはしない
+        shared_copy = self._shared_data
+        interim_text = self._interim_text
+        mic_volume = getattr(self.audio_processor, 'latest_volume', 0.0)
         
-        print(f"[Main-Thread] Shared data: final='{shared_copy['all_final_text']}', interim='{shared_copy['interim_text']}'")
-        print(f"[DEBUG] self.is_streaming={self.is_streaming}, audio_processor.is_recording={self.audio_processor.is_recording}")
-        
-        # セッション状態を更新
-        prefix = self.session_state_key_prefix
-        st.session_state[f"{prefix}_all_final_text"] = shared_copy['all_final_text']
-        st.session_state[f"{prefix}_interim_text"] = shared_copy['interim_text']
-        st.session_state[f"{prefix}_extracted_addresses"] = shared_copy['extracted_addresses']
-        st.session_state[f"{prefix}_best_address"] = shared_copy['best_address']
-        st.session_state[f"{prefix}_error_message"] = shared_copy['error_message']
-        
-        if shared_copy['performance_stats'] and "performance_stats" in prefix:
-            st.session_state[f"{prefix}_performance_stats"] = shared_copy['performance_stats'].copy()
+        # 前回のポーリングから何も変わっていなければ同じdictを返す（無音・待機中の再描画で毎回作らない）
+        # 返したdictは書き換えないので、呼び出し側が保持していても内容は変わらない
+        last = self._last_session_data
+        if last is not None and last[0] is shared_copy and last[1] is interim_text and last[2] == mic_volume:
+            return last[3]
         
         # データを返す
         data = {
             'all_final_text': shared_copy['all_final_text'],
-            'interim_text': shared_copy['interim_text'],
+            'interim_text': interim_text,
             'extracted_addresses': shared_copy['extracted_addresses'],
             'best_address': shared_copy['best_address'],
             'error_message': shared_copy['error_message'],
-            'mic_volume': getattr(self.audio_processor, 'latest_volume', 0.0),  # 追加
+            'mic_volume': mic_volume,  # 追加
         }
         if shared_copy['performance_stats']:
             data['performance_stats'] = shared_copy['performance_stats']
         
+        self._last_session_data = (shared_copy, interim_text, mic_volume, data)
         return data
 
     def clear_session_state(self):
         """セッション状態と共有データをクリア"""
-        print(f"[Main-Thread-{threading.get_ident()}] Clearing session state and shared data...")
+        logger.debug("Clearing session state and shared data")
         
         # 共有データをクリア
         with self._data_lock:
-            self._shared_data['all_final_text'] = ''
-            self._shared_data['interim_text'] = ''
-            self._shared_data['extracted_addresses'] = []
-            self._shared_data['best_address'] = None
-            self._shared_data['error_message'] = ''
+            changes = {
+                'all_final_text': '',
+                'extracted_addresses': [],
+                'best_address': None,
+                'error_message': ''
+            }
             if self._shared_data['performance_stats']:
-                self._shared_data['performance_stats'] = {
+                changes['performance_stats'] = {
                     'total_extractions': 0, 'fast_extractions': 0, 'total_time_ms': 0, 
                     'min_time_ms': float('inf'), 'max_time_ms': 0, 'avg_time_ms': 0
                 }
-        
-        # セッション状態も初期化
-        self._initialize_session_state()
+            self._interim_text = ''
+            self._publish_shared_data(**changes)
+            self._final_chunks = []
+            self._last_parse_text = None
+            self._parsed_chunk_count = 0
+            self._parse_in_flight = False
+            self._parse_pending = False
+            self._parse_generation += 1
+        # 画面は get_session_state_data の戻り値だけを使うので、st.session_state のキーはここで書き直さない
+        # （レガシー経路が使うキーはその経路で必要になったときに初期化する）
     
     def warm_up_services(self):
         """サービスの暖機実行"""
@@ -414,19 +717,17 @@ class WebRTCSpeechService:
             self._warm_up_speech_client()
             return True
         except Exception as e:
-            print(f"Warm-up process failed: {e}")
+            logger.warning("Warm-up process failed: %s", e)
             return False
     
     def _warm_up_speech_client(self):
         """Google Cloud Speech Clientを事前暖機"""
         try:
-            config = speech.RecognitionConfig(encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16, sample_rate_hertz=self.sample_rate, language_code="ja-JP")
-            streaming_config = speech.StreamingRecognitionConfig(config=config, single_utterance=True)
             def dummy_audio_generator():
-                yield speech.StreamingRecognizeRequest(audio_content=b'\x00' * 3200)
-            responses = self.client.streaming_recognize(streaming_config, dummy_audio_generator(), timeout=1.0)
+                yield speech.StreamingRecognizeRequest(audio_content=_WARM_UP_SILENCE)
+            responses = self.client.streaming_recognize(self._warm_up_streaming_config, dummy_audio_generator(), timeout=1.0)
             try:
                 for _ in responses: pass
             except Exception: pass
         except Exception as e:
-            print(f"Speech client warm-up failed (non-critical): {e}")
+            logger.debug("Speech client warm-up failed (non-critical): %s", e)